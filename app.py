@@ -1,18 +1,19 @@
 import os
 from flask import Flask, render_template, request, jsonify, session
-from flask_login import LoginManager, current_user
-from flask_socketio import SocketIO, emit
+from flask_login import LoginManager
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
 import json
+import click
 
 # Load environment variables
 load_dotenv()
 
 # Initialize Flask app
 app = Flask(__name__)
-app.config['DEBUG'] = True  # bật debug
-app.config['ENV'] = 'development'  # môi trường dev
+# FLASK_ENV=production: tắt debug (gunicorn dùng wsgi.py + gunicorn.conf.py); mặc định development như trước
+app.config['ENV'] = os.environ.get("FLASK_ENV", "development")
+app.config['DEBUG'] = os.environ.get("FLASK_DEBUG", "1" if app.config['ENV'] == 'development' else "0") == "1"
 
 app.config["SECRET_KEY"] = os.environ.get(
     "SECRET_KEY", "dev-secret-key-change-in-production"
@@ -28,8 +29,31 @@ if "channel_binding" in db_url:
 
 app.config["SQLALCHEMY_DATABASE_URI"] = db_url
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-
-print("DATABASE_URL =", db_url)
+if not db_url.startswith("sqlite"):
+    # Mỗi worker có pool riêng: tổng kết nối tối đa = số worker x (DB_POOL_SIZE + DB_MAX_OVERFLOW)
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+        "pool_size": int(os.environ.get("DB_POOL_SIZE", 5)),
+        "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", 10)),
+        "pool_timeout": int(os.environ.get("DB_POOL_TIMEOUT", 30)),
+        "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", 1800)),  # giây; thấp hơn idle timeout của DB / proxy
+        "pool_pre_ping": os.environ.get("DB_POOL_PRE_PING", "1") == "1",
+    }
+app.config["SQL_PROFILING"] = os.environ.get("SQL_PROFILING") == "1"
+app.config["SLOW_QUERY_MS"] = float(os.environ.get("SLOW_QUERY_MS", 100))
+app.config["INVENTORY_LOG_HOT_DAYS"] = int(os.environ.get("INVENTORY_LOG_HOT_DAYS", 90))
+app.config["EXPORT_DIR"] = os.environ.get("EXPORT_DIR")  # mặc định: instance/exports
+app.config["JOB_WORKERS"] = int(os.environ.get("JOB_WORKERS", 2))
+app.config["USER_CACHE_TTL"] = int(os.environ.get("USER_CACHE_TTL", 60))
+app.config["PASSWORD_HASH_PROFILE"] = os.environ.get("PASSWORD_HASH_PROFILE", "standard")  # standard | scrypt | low
+app.config["LOGIN_RATE_LIMIT_IP"] = int(os.environ.get("LOGIN_RATE_LIMIT_IP", 20))
+app.config["LOGIN_RATE_LIMIT_USER"] = int(os.environ.get("LOGIN_RATE_LIMIT_USER", 5))
+# Sau reverse proxy / router: số proxy tin cậy, để remote_addr (khoá giới hạn đăng nhập) là IP thật của client
+app.config["PROXY_FIX_HOPS"] = int(os.environ.get("PROXY_FIX_HOPS", 0))
+if app.config["PROXY_FIX_HOPS"]:
+    from werkzeug.middleware.proxy_fix import ProxyFix
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config["PROXY_FIX_HOPS"], x_proto=app.config["PROXY_FIX_HOPS"])
+app.config["CATALOG_CACHE_TTL"] = int(os.environ.get("CATALOG_CACHE_TTL", 30))
+app.config["FRAGMENT_CACHE_BYTES"] = int(os.environ.get("FRAGMENT_CACHE_MB", 32)) * 1024 * 1024
 
 # Initialize extensions
 from database import db
@@ -42,36 +66,32 @@ login_manager.login_view = 'auth.login'
 login_manager.login_message = 'Vui lòng đăng nhập để truy cập trang này.'
 
 # Initialize SocketIO for real-time updates
-socketio = SocketIO(app, cors_allowed_origins="*")
+app.config["SOCKETIO_MESSAGE_QUEUE"] = os.environ.get("SOCKETIO_MESSAGE_QUEUE")  # ví dụ redis://localhost:6379/0
+app.config["STORE_ID"] = os.environ.get("STORE_ID", "main")
+app.config["SOCKETIO_ASYNC_MODE"] = os.environ.get("SOCKETIO_ASYNC_MODE")  # eventlet | gevent | threading; trống = tự chọn
+import events
+from events import socketio
+events.init_app(app)
 
 # Import models and blueprints
 from models import User
 from auth import auth_bp
 from routes import main_bp
+import search, migrations, instrumentation, user_cache, http_cache
 
 # Register blueprints
 app.register_blueprint(auth_bp)
 app.register_blueprint(main_bp)
 
-@login_manager.user_loader
-def load_user(user_id):
-    return User.query.get(int(user_id))
-
-# Real-time updates
-@socketio.on('connect')
-def handle_connect():
-    if current_user.is_authenticated:
-        emit('connected', {'user_id': current_user.id, 'username': current_user.username})
+# Opt-in SQL instrumentation (SQL_PROFILING=1)
+instrumentation.init_app(app)
 
-@socketio.on('new_sale')
-def handle_new_sale(data):
-    # Broadcast new sale to all connected clients
-    emit('sale_update', data, broadcast=True, include_self=False)
+# Conditional GET, fragment cache và biên dịch sẵn template
+http_cache.init_app(app)
 
-@socketio.on('inventory_update')
-def handle_inventory_update(data):
-    # Broadcast inventory update to all connected clients
-    emit('stock_update', data, broadcast=True, include_self=False)
+@login_manager.user_loader
+def load_user(user_id):
+    return user_cache.load_user(user_id)
 
 # Error handlers
 @app.errorhandler(404)
@@ -83,19 +103,78 @@ def internal_error(error):
     db.session.rollback()
     return render_template('500.html'), 500
 
-# Create database tables
-with app.app_context():
-    db.create_all()
-    # Create admin user if not exists
+# CLI commands
+@app.cli.command('backfill-sales-summary')
+@click.option('--since', default=None, help='Chỉ tính lại từ ngày này (YYYY-MM-DD)')
+def backfill_sales_summary(since):
+    import sales_summary
+    start = datetime.strptime(since, '%Y-%m-%d').date() if since else None
+    click.echo(f'Đã ghi {sales_summary.rebuild(start)} dòng tổng hợp doanh thu')
+
+@app.cli.command('rebuild-customer-metrics')
+def rebuild_customer_metrics():
+    import customer_metrics
+    click.echo(f'Đã tính lại chỉ số cho {customer_metrics.rebuild()} khách hàng')
+
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index():
+    click.echo(f'Đã đánh chỉ mục {search.rebuild()} bản ghi')
+
+@app.cli.command('db-upgrade')
+@click.option('--status', is_flag=True, help='Chỉ hiển thị trạng thái các migration')
+def db_upgrade(status):
+    if not status:
+        click.echo(f'Đã chạy migration: {migrations.upgrade() or "không có"}')
+    for version, name, applied in migrations.status():
+        click.echo(f'{version:>4}  {"x" if applied else " "}  {name}')
+
+@app.cli.command('snapshot-stock')
+@click.option('--keep-days', default=None, type=int, help='Xoá snapshot cũ hơn N ngày (mặc định INVENTORY_LOG_HOT_DAYS, cùng mốc lưu trữ log)')
+def snapshot_stock(keep_days):
+    import inventory_history
+    keep_days = keep_days if keep_days is not None else app.config['INVENTORY_LOG_HOT_DAYS']
+    before = datetime.utcnow() - timedelta(days=keep_days)  # tính trước khi chụp: không xoá snapshot vừa ghi
+    click.echo(f'Đã ghi snapshot tồn kho cho {inventory_history.take_snapshot()} sản phẩm')
+    click.echo(f'Đã xoá {inventory_history.prune_snapshots(before)} dòng snapshot trước {before:%Y-%m-%d}')
+
+@app.cli.command('archive-inventory-logs')
+@click.option('--days', default=None, type=int, help='Giữ lại log trong N ngày gần nhất (mặc định INVENTORY_LOG_HOT_DAYS)')
+@click.option('--batch', default=5000, show_default=True, help='Số dòng mỗi transaction')
+def archive_inventory_logs(days, batch):
+    import inventory_history
+    days = days if days is not None else app.config['INVENTORY_LOG_HOT_DAYS']
+    before = datetime.utcnow() - timedelta(days=days)
+    click.echo(f'Đã chuyển {inventory_history.archive(before, batch)} dòng log trước {before:%Y-%m-%d} sang inventory_logs_archive')
+
+@app.cli.command('check-indexes')
+def check_indexes():
+    missing = migrations.missing_indexes()
+    for table, columns, pattern in missing:
+        click.echo(f'THIẾU  {table}({columns})  <- {pattern}')
+    if missing: raise SystemExit(1)
+    click.echo('Đủ chỉ mục cho các truy vấn chính')
+
+@app.cli.command('init-db')
+@click.option('--admin-password', envvar='ADMIN_PASSWORD', default='admin123', help='Mật khẩu admin nếu phải tạo mới')
+def init_db_command(admin_password):
+    init_db(admin_password)
+    click.echo('Đã cập nhật schema và tài khoản admin')
+
+def init_db(admin_password='admin123'):
+    """Chạy migration và tạo tài khoản admin nếu chưa có. Chạy một lần khi deploy, không chạy lúc import app."""
+    migrations.upgrade()
     if not User.query.filter_by(username='admin').first():
         admin = User(
             username='admin',
             email='admin@salespro.com',
             role='admin'
         )
-        admin.set_password('admin123')
+        admin.set_password(admin_password)
         db.session.add(admin)
         db.session.commit()
 
 if __name__ == '__main__':
-     socketio.run(app, debug=True)
\ No newline at end of file
+    # Server dev: tự khởi tạo DB cho tiện; production chạy `flask --app app init-db` (xem Procfile)
+    with app.app_context():
+        init_db()
+    socketio.run(app, debug=app.config['DEBUG'])
@@ -1,6 +1,8 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_user, logout_user, login_required, current_user
+from sqlalchemy import or_
 from models import User, db
+import security
 from datetime import datetime
 
 auth_bp = Blueprint('auth', __name__)
@@ -15,9 +17,21 @@ def login():
         password = request.form.get('password')
         remember = bool(request.form.get('remember'))
         
+        # Từ chối trước khi băm mật khẩu (tốn CPU) nếu IP / tài khoản đang bị dò
+        wait = security.login_retry_after(request.remote_addr, username)
+        if wait:
+            flash(f'Đăng nhập sai quá nhiều lần, vui lòng thử lại sau {wait} giây.', 'danger')
+            return render_template('login.html'), 429, {'Retry-After': str(wait)}
+        
         user = User.query.filter_by(username=username).first()
+        ok = bool(user and user.is_active and user.check_password(password))
+        security.record_login(request.remote_addr, username, ok)
         
-        if user and user.check_password(password) and user.is_active:
+        if ok:
+            if security.needs_rehash(user.password_hash):
+                # Hash cũ (cấu hình trước đây): băm lại bằng cấu hình hiện tại khi đã có mật khẩu gốc
+                user.set_password(password)
+                db.session.commit()
             login_user(user, remember=remember)
             flash('Đăng nhập thành công!', 'success')
             next_page = request.args.get('next')
@@ -43,11 +57,12 @@ def register():
             flash('Mật khẩu không khớp!', 'danger')
             return redirect(url_for('auth.register'))
         
-        if User.query.filter_by(username=username).first():
+        existing = User.query.filter(or_(User.username == username, User.email == email)).all()
+        if any(u.username == username for u in existing):
             flash('Tên đăng nhập đã tồn tại!', 'danger')
             return redirect(url_for('auth.register'))
         
-        if User.query.filter_by(email=email).first():
+        if existing:
             flash('Email đã được sử dụng!', 'danger')
             return redirect(url_for('auth.register'))
         
@@ -0,0 +1,197 @@
+# bench/run.py
+# Phát lại một hỗn hợp request (dashboard, sales, new_sale, adjust_inventory, export) và báo cáo
+# độ trễ p50/p95/p99 cùng số câu SQL mỗi request (đọc từ header Server-Timing).
+#
+#   python -m bench.run --requests 2000                       # Flask test client, trong tiến trình
+#   python -m bench.run --url http://127.0.0.1:8000 --concurrency 8   # gunicorn cục bộ (chạy với SQL_PROFILING=1)
+import argparse, json, os, random, re, threading, time
+from collections import defaultdict, namedtuple
+from datetime import datetime, timedelta
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import HTTPCookieProcessor, HTTPRedirectHandler, Request, build_opener
+
+Result = namedtuple('Result', 'status timing location')
+
+# (tên, trọng số)
+MIX = [('dashboard', 30), ('sales', 25), ('sales_search', 5), ('new_sale', 15), ('adjust_inventory', 15),
+       ('export_sales', 5), ('reports', 5)]
+# Response dạng stream gửi header trước khi chạy SQL: số câu SQL lấy từ bộ đếm theo endpoint (/api/metrics)
+STREAMED = {'export_sales': 'main.export_sales'}
+
+class TestClientTarget:
+    def __init__(self):
+        os.environ.setdefault('SQL_PROFILING', '1')
+        from app import app
+        self.app = app
+        self.local = threading.local()
+
+    def client(self):
+        if not hasattr(self.local, 'client'):
+            self.local.client = self.app.test_client()
+        return self.local.client
+
+    def metrics(self):
+        from instrumentation import registry
+        return {ep: (v[0], v[2]) for ep, v in registry.snapshot().items()}
+
+    def request(self, method, path, data=None, json_body=None):
+        resp = self.client().open(path, method=method, data=data, json=json_body)
+        resp.get_data()  # tiêu thụ hết body (quan trọng với response dạng stream)
+        resp.close()  # như WSGI server: chốt số liệu đo của response dạng stream
+        return Result(resp.status_code, resp.headers.getlist('Server-Timing'), resp.headers.get('Location', ''))
+
+class NoRedirect(HTTPRedirectHandler):
+    # Đo chính request được gọi, không đo trang được chuyển tới; 3xx trả về như HTTPError
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+class HttpTarget:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.local = threading.local()
+
+    def opener(self):
+        if not hasattr(self.local, 'opener'):
+            self.local.opener = build_opener(HTTPCookieProcessor(CookieJar()), NoRedirect())
+        return self.local.opener
+
+    def request(self, method, path, data=None, json_body=None):
+        body, headers = None, {}
+        if json_body is not None: body, headers = json.dumps(json_body).encode(), {'Content-Type': 'application/json'}
+        elif data is not None: body, headers = urlencode(data).encode(), {'Content-Type': 'application/x-www-form-urlencoded'}
+        try:
+            with self.opener().open(Request(self.base_url + path, data=body, headers=headers, method=method)) as resp:
+                resp.read()
+                return Result(resp.status, resp.headers.get_all('Server-Timing') or [], resp.headers.get('Location', ''))
+        except HTTPError as e:
+            return Result(e.code, e.headers.get_all('Server-Timing') or [], e.headers.get('Location', ''))
+
+    def metrics(self):
+        # Chỉ của worker trả lời request này: chạy gunicorn 1 worker nếu cần số SQL chính xác cho export
+        try:
+            with self.opener().open(self.base_url + '/api/metrics') as resp: return parse_metrics(resp.read().decode())
+        except HTTPError:
+            return {}
+
+def parse_metrics(body):
+    values = defaultdict(lambda: [0, 0])
+    for name, endpoint, value in re.findall(r'^(salespro_requests_total|salespro_db_queries_total)\{endpoint="([^"]*)"\} (\S+)$', body, re.M):
+        values[endpoint][name == 'salespro_db_queries_total'] = int(float(value))
+    return {ep: tuple(v) for ep, v in values.items()}
+
+def failed(result):
+    # 3xx về /login nghĩa là phiên đăng nhập mất / không hợp lệ, không phải request thành công
+    return result.status >= 400 or (300 <= result.status < 400 and '/login' in result.location)
+
+def queries_from(server_timing):
+    for entry in server_timing:
+        match = re.search(r'desc="(\d+) queries"', entry)
+        if match: return int(match.group(1))
+    return None
+
+def percentile(sorted_values, p):
+    if not sorted_values: return 0.0
+    k = (len(sorted_values) - 1) * p / 100
+    lo, hi = int(k), min(int(k) + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+class Workload:
+    def __init__(self, target, product_ids, rng):
+        self.target, self.product_ids, self.rng = target, product_ids, rng
+
+    def call(self, name):
+        t, rng = self.target, self.rng
+        if name == 'dashboard': return t.request('GET', '/')
+        if name == 'sales': return t.request('GET', '/sales')
+        if name == 'sales_search': return t.request('GET', '/sales?' + urlencode({'search': 'SALE-' + datetime.utcnow().strftime('%Y%m')}))
+        if name == 'new_sale':
+            items = [{'product_id': rng.choice(self.product_ids), 'quantity': 1} for _ in range(rng.randint(1, 8))]
+            return t.request('POST', '/sale/new', data={'items': json.dumps(items), 'payment_method': 'cash'})
+        if name == 'adjust_inventory':
+            return t.request('POST', '/api/inventory/adjust', json_body={'product_id': rng.choice(self.product_ids),
+                                                                         'type': 'increase', 'quantity': rng.randint(1, 20),
+                                                                         'reason': 'benchmark'})
+        if name == 'export_sales':
+            day = (datetime.now() - timedelta(days=rng.randint(0, 30))).strftime('%Y-%m-%d')
+            return t.request('GET', '/api/sales/export?' + urlencode({'date_from': day, 'date_to': day}))
+        if name == 'reports': return t.request('GET', '/reports?period=' + rng.choice(['today', 'week', 'month']))
+        raise ValueError(name)
+
+def run(target, total, concurrency, product_ids, username, password, seed=1):
+    results = defaultdict(lambda: {'latency': [], 'queries': [], 'errors': 0})
+    lock = threading.Lock()
+    names, weights = zip(*MIX)
+    counter = iter(range(total))
+    login_errors = []
+    target.request('POST', '/login', data={'username': username, 'password': password})  # phiên của luồng chính, để đọc metrics
+    before = target.metrics()
+
+    def worker(n):
+        rng = random.Random(seed + n)
+        login = target.request('POST', '/login', data={'username': username, 'password': password})
+        if login.status != 302 or '/login' in login.location:
+            with lock: login_errors.append(f'đăng nhập thất bại (HTTP {login.status})')
+            return
+        load = Workload(target, product_ids, rng)
+        while True:
+            with lock:
+                if login_errors or next(counter, None) is None: return
+            name = rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            try: result = load.call(name)
+            except Exception: result = Result(599, [], '')
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                r = results[name]
+                r['latency'].append(elapsed)
+                if failed(result): r['errors'] += 1
+                q = queries_from(result.timing)
+                if q is not None: r['queries'].append(q)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    started = time.perf_counter()
+    for th in threads: th.start()
+    for th in threads: th.join()
+    if login_errors: raise SystemExit(f'Dừng benchmark: {login_errors[0]}')
+    elapsed, after = time.perf_counter() - started, target.metrics()
+    for name, endpoint in STREAMED.items():
+        (req0, q0), (req1, q1) = before.get(endpoint, (0, 0)), after.get(endpoint, (0, 0))
+        if name in results and req1 > req0: results[name]['queries'] = [(q1 - q0) / (req1 - req0)]
+    return results, elapsed
+
+def report(results, elapsed, out=print):
+    out(f'{"endpoint":<18}{"n":>7}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"sql/req":>9}{"errors":>8}')
+    total = 0
+    for name, _ in MIX:
+        r = results.get(name)
+        if not r: continue
+        lat = sorted(r['latency']); total += len(lat)
+        q = sum(r['queries']) / len(r['queries']) if r['queries'] else float('nan')
+        out(f'{name:<18}{len(lat):>7}{percentile(lat, 50):>10.1f}{percentile(lat, 95):>10.1f}{percentile(lat, 99):>10.1f}'
+            f'{q:>9.1f}{r["errors"]:>8}')
+    out(f'{total} requests trong {elapsed:.1f}s ({total / elapsed:.1f} req/s)')
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark SalesPro')
+    parser.add_argument('--url', help='URL server (mặc định: Flask test client trong tiến trình)')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--username', default='admin')
+    parser.add_argument('--password', default='admin123')
+    parser.add_argument('--products', type=int, default=1000, help='Số sản phẩm còn hàng dùng cho new_sale/adjust')
+    args = parser.parse_args()
+
+    target = HttpTarget(args.url) if args.url else TestClientTarget()
+    from app import app
+    from models import Product
+    with app.app_context():
+        product_ids = [pid for pid, in Product.query.with_entities(Product.id)
+                       .filter(Product.stock_quantity > 50).limit(args.products)]
+    if not product_ids: raise SystemExit('Chưa có dữ liệu: chạy python -m bench.seed trước')
+    results, elapsed = run(target, args.requests, args.concurrency, product_ids, args.username, args.password)
+    report(results, elapsed)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+# bench/seed.py
+# Sinh dữ liệu lớn cho benchmark (mặc định 100k sản phẩm, 1M đơn hàng, ~5M dòng hàng).
+#
+#   DATABASE_URL=sqlite:///bench.db python -m bench.seed --sales 1000000
+#   DATABASE_URL=postgresql://localhost/salespro_bench python -m bench.seed
+#
+# Ghi bằng INSERT nhiều dòng qua SQLAlchemy Core theo lô; khoá chính được gán trước để không cần đọc lại id.
+import argparse, random, time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from sqlalchemy import func, insert, text
+from app import app, init_db
+from database import db
+from models import User, Product, Customer, Sale, SaleItem, SaleSequence
+import customer_metrics, sales_summary, search
+
+CATEGORIES = ['Điện thoại', 'Laptop', 'Phụ kiện', 'Máy tính bảng', 'Đồng hồ', 'Âm thanh', 'Gia dụng', 'Văn phòng phẩm']
+PAYMENT_METHODS = ['cash'] * 5 + ['credit_card'] * 3 + ['bank_transfer'] * 2
+WORDS = ['Pro', 'Max', 'Mini', 'Lite', 'Plus', 'Ultra', 'Air', 'Neo', 'X', 'S']
+
+def _next_id(model):
+    return (db.session.query(func.max(model.id)).scalar() or 0) + 1
+
+def _flush(table, rows):
+    if rows: db.session.execute(insert(table), rows); rows.clear()
+
+def seed(products=100_000, customers=50_000, sales=1_000_000, items_per_sale=5, days=365, batch=5000, rng_seed=42, log=print):
+    rng = random.Random(rng_seed)
+    user_id = db.session.query(User.id).filter_by(username='admin').scalar()
+    now = datetime.utcnow()
+    started = time.perf_counter()
+
+    first_product, rows, prices = _next_id(Product), [], []
+    for i in range(products):
+        price = Decimal(rng.randrange(10, 5000) * 1000)
+        prices.append(price)
+        rows.append({'id': first_product + i, 'name': f'{rng.choice(CATEGORIES)} {rng.choice(WORDS)} {i}',
+                     'sku': f'BENCH-{first_product + i:08d}', 'category': rng.choice(CATEGORIES), 'description': '',
+                     'price': price, 'cost_price': price * Decimal('0.7'), 'stock_quantity': rng.randint(0, 500),
+                     'min_stock': 10, 'created_at': now, 'updated_at': now})
+        if len(rows) >= batch: _flush(Product, rows)
+    _flush(Product, rows); db.session.commit()
+    log(f'products: {products} ({time.perf_counter() - started:.1f}s)')
+
+    first_customer = _next_id(Customer)
+    for i in range(customers):
+        rows.append({'id': first_customer + i, 'name': f'Khách hàng {i:06d}', 'phone': f'09{rng.randrange(10**8):08d}',
+                     'email': f'kh{i}@example.com', 'customer_type': rng.choice(['retail', 'retail', 'wholesale', 'corporate']),
+                     'created_at': now})
+        if len(rows) >= batch: _flush(Customer, rows)
+    _flush(Customer, rows); db.session.commit()
+    log(f'customers: {customers} ({time.perf_counter() - started:.1f}s)')
+
+    first_sale, first_item, item_rows, per_day = _next_id(Sale), _next_id(SaleItem), [], {}
+    start_day = now - timedelta(days=days)
+    item_id = first_item
+    for i in range(sales):
+        sale_id = first_sale + i
+        sale_date = start_day + timedelta(seconds=rng.randrange(days * 86400))
+        day = sale_date.date()
+        per_day[day] = per_day.get(day, 0) + 1
+        total = Decimal(0)
+        for _ in range(rng.randint(1, 2 * items_per_sale - 1)):
+            idx = rng.randrange(products)
+            qty = rng.randint(1, 3)
+            item_rows.append({'id': item_id, 'sale_id': sale_id, 'product_id': first_product + idx, 'quantity': qty,
+                              'unit_price': prices[idx], 'total_price': prices[idx] * qty})
+            item_id += 1; total += prices[idx] * qty
+        rows.append({'id': sale_id, 'sale_code': f'SALE-{day:%Y%m%d}-{per_day[day] + 500000:06d}',
+                     'customer_id': first_customer + rng.randrange(customers) if customers and rng.random() < 0.7 else None,
+                     'user_id': user_id, 'total_amount': total, 'discount': 0, 'tax': 0,
+                     'payment_method': rng.choice(PAYMENT_METHODS), 'status': 'cancelled' if rng.random() < 0.02 else 'completed',
+                     'sale_date': sale_date, 'notes': None})
+        if len(rows) >= batch:
+            _flush(Sale, rows); _flush(SaleItem, item_rows); db.session.commit()
+        if (i + 1) % 100_000 == 0: log(f'sales: {i + 1} ({time.perf_counter() - started:.1f}s)')
+    _flush(Sale, rows); _flush(SaleItem, item_rows); db.session.commit()
+    log(f'sales: {sales}, sale_items: {item_id - first_item} ({time.perf_counter() - started:.1f}s)')
+
+    # Mã benchmark dùng dải 500000+ trong ngày, đẩy bộ đếm qua dải đó để bộ cấp mã không trùng
+    for day, count in per_day.items():
+        seq = db.session.get(SaleSequence, day) or SaleSequence(day=day, last_value=0)
+        seq.last_value = max(seq.last_value or 0, 500000 + count)
+        db.session.add(seq)
+    db.session.commit()
+    if db.engine.dialect.name == 'postgresql':
+        for table in ('products', 'customers', 'sales', 'sale_items'):
+            db.session.execute(text(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT max(id) FROM {table}))"))
+        db.session.commit()
+        db.session.execute(text('ANALYZE'))
+
+    log(f'daily summaries: {sales_summary.rebuild()}, customer metrics: {customer_metrics.rebuild()}, '
+        f'search index: {search.rebuild()} ({time.perf_counter() - started:.1f}s)')
+
+def main():
+    parser = argparse.ArgumentParser(description='Sinh dữ liệu benchmark')
+    parser.add_argument('--products', type=int, default=100_000)
+    parser.add_argument('--customers', type=int, default=50_000)
+    parser.add_argument('--sales', type=int, default=1_000_000)
+    parser.add_argument('--items-per-sale', type=int, default=5)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--batch', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    with app.app_context():
+        init_db()
+        seed(args.products, args.customers, args.sales, args.items_per_sale, args.days, args.batch, args.seed)
+
+if __name__ == '__main__':
+    main()
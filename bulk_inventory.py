@@ -0,0 +1,222 @@
+# bulk_inventory.py
+# Điều chỉnh tồn kho hàng loạt (kiểm kê) và nhập sản phẩm từ file CSV/XLSX.
+# Xử lý theo lô BULK_CHUNK_SIZE dòng: khoá sản phẩm bằng một truy vấn IN, UPDATE/INSERT theo lô, ghi InventoryLog theo lô.
+# Điều chỉnh hàng loạt là một transaction (tất cả hoặc không gì cả); nhập file commit từng lô và bỏ qua dòng lỗi.
+# Cả yêu cầu chỉ phát một sự kiện tóm tắt qua Socket.IO.
+import csv, io
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from flask import current_app
+from sqlalchemy import insert, or_, select, update
+from database import db
+from models import Product, InventoryLog
+import catalog, events, reporting, search, today_stats
+
+ADJUST_TYPES = ('increase', 'decrease', 'adjustment', 'return')
+MAX_ERRORS = 100
+
+class BulkError(Exception):
+    def __init__(self, message, errors=()):
+        super().__init__(message)
+        self.errors = list(errors)[:MAX_ERRORS]
+
+def _chunks(iterable, size):
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk: return
+        yield chunk
+
+def _chunk_size():
+    return current_app.config.get('BULK_CHUNK_SIZE', 500)
+
+def new_quantity(change_type, previous, quantity):
+    if change_type in ('increase', 'return'): return previous + quantity
+    if change_type == 'decrease': return previous - quantity
+    return quantity  # adjustment: đặt bằng số kiểm kê
+
+def _finish(user, changed, low_stock, summary):
+    """Sau khi mọi lô đã commit: xoá cache báo cáo, cập nhật dashboard, phát một sự kiện."""
+    if not changed: return
+    reporting.cache.invalidate(report='inventory_report')
+    catalog.invalidate()
+    today_stats.record(low_stock=low_stock)
+    events.publish_inventory_bulk(dict(summary, products=changed, user=user.username))
+
+# ===== ĐIỀU CHỈNH HÀNG LOẠT =====
+def _parse_adjustment(item):
+    if not isinstance(item, dict): raise ValueError('Dòng không hợp lệ')
+    change_type = item.get('type') or 'adjustment'
+    if change_type not in ADJUST_TYPES: raise ValueError(f'Loại điều chỉnh không hợp lệ: {change_type}')
+    try: quantity = int(item.get('quantity'))
+    except (TypeError, ValueError): raise ValueError('Số lượng không hợp lệ')
+    if quantity < 0: raise ValueError('Số lượng không được âm')
+    if item.get('product_id') in (None, '') and not item.get('sku'): raise ValueError('Thiếu product_id hoặc sku')
+    try: product_id = int(item['product_id']) if item.get('product_id') not in (None, '') else None
+    except (TypeError, ValueError): raise ValueError('product_id không hợp lệ')
+    return {'product_id': product_id, 'sku': str(item.get('sku') or '').strip(), 'type': change_type,
+            'quantity': quantity, 'reason': item.get('reason')}
+
+def _resolve(parsed):
+    """Gán product_id cho các dòng chỉ có sku; trả về {product_id: stock_quantity} hiện tại."""
+    stock = {}
+    for chunk in _chunks(parsed, _chunk_size()):
+        ids = {a['product_id'] for _, a in chunk if a['product_id']}
+        skus = {a['sku'] for _, a in chunk if not a['product_id']}
+        rows = db.session.execute(select(Product.id, Product.sku, Product.stock_quantity)
+                                  .where(or_(Product.id.in_(ids), Product.sku.in_(skus)))).all()
+        by_sku = {sku: pid for pid, sku, _ in rows}
+        stock.update((pid, qty or 0) for pid, _, qty in rows)
+        for _, a in chunk:
+            if not a['product_id']: a['product_id'] = by_sku.get(a['sku'])
+    return stock
+
+def adjust(user, items, reason=''):
+    """Áp dụng danh sách điều chỉnh [{product_id | sku, type, quantity, reason}].
+    Kiểm tra cả lô trước rồi ghi trong một transaction (khoá các sản phẩm tới khi commit);
+    có lỗi thì không ghi gì (BulkError). Trả về thống kê."""
+    parsed, errors = [], []
+    for index, item in enumerate(items):
+        try: parsed.append((index, _parse_adjustment(item)))
+        except ValueError as e: errors.append({'row': index, 'message': str(e)})
+    if not parsed and not errors: raise BulkError('Không có dòng nào để điều chỉnh')
+
+    stock = _resolve(parsed)
+    projected = dict(stock)
+    for index, a in parsed:
+        if a['product_id'] not in stock:
+            errors.append({'row': index, 'message': f'Không tìm thấy sản phẩm {a["sku"] or a["product_id"]}'}); continue
+        projected[a['product_id']] = new_quantity(a['type'], projected[a['product_id']], a['quantity'])
+        if projected[a['product_id']] < 0: errors.append({'row': index, 'message': 'Số lượng không đủ'})
+    if errors: raise BulkError(f'{len(errors)} dòng không hợp lệ', sorted(errors, key=lambda e: e['row']))
+
+    applied, changed, low_stock, now = 0, set(), 0, datetime.utcnow()
+    for chunk in _chunks(parsed, _chunk_size()):
+        ids = {a['product_id'] for _, a in chunk}
+        # Đọc lại dưới khoá: tồn kho có thể đã đổi từ lúc kiểm tra
+        current = {pid: (qty or 0, min_stock) for pid, qty, min_stock in db.session.execute(
+            select(Product.id, Product.stock_quantity, Product.min_stock).where(Product.id.in_(ids)).with_for_update())}
+        running = {pid: qty for pid, (qty, _) in current.items()}
+        logs = []
+        for index, a in chunk:
+            pid = a['product_id']
+            if pid not in running:  # bị xoá sau khi kiểm tra
+                db.session.rollback()
+                raise BulkError('Sản phẩm vừa bị xoá, vui lòng thử lại', [{'row': index, 'message': f'Không tìm thấy sản phẩm {a["sku"] or pid}'}])
+            previous = running[pid]
+            quantity = new_quantity(a['type'], previous, a['quantity'])
+            if quantity < 0:
+                db.session.rollback()
+                raise BulkError('Tồn kho vừa thay đổi, vui lòng thử lại', [{'row': index, 'message': 'Số lượng không đủ'}])
+            running[pid] = quantity
+            logs.append({'product_id': pid, 'change_type': a['type'], 'quantity_change': quantity - previous,
+                         'previous_quantity': previous, 'new_quantity': quantity, 'reason': a['reason'] or reason,
+                         'user_id': user.id, 'created_at': now})
+        db.session.execute(update(Product), [{'id': pid, 'stock_quantity': qty, 'updated_at': now} for pid, qty in running.items()])
+        db.session.execute(insert(InventoryLog), logs)
+        db.session.flush()
+        applied += len(logs); changed |= ids
+        low_stock += today_stats.low_stock_change([(current[pid][0], qty, current[pid][1]) for pid, qty in running.items()])
+    db.session.commit()
+    _finish(user, len(changed), low_stock, {'source': 'adjust', 'reason': reason, 'rows': applied})
+    return {'applied': applied, 'products': len(changed)}
+
+# ===== NHẬP SẢN PHẨM TỪ FILE =====
+def read_rows(file):
+    """Đọc file .csv / .xlsx theo luồng -> (số dòng, {cột: giá trị}); tên cột không phân biệt hoa thường."""
+    name = (file.filename or '').lower()
+    if name.endswith('.csv'):
+        reader = csv.DictReader(io.TextIOWrapper(file.stream, encoding='utf-8-sig', newline=''))
+        reader.fieldnames = [(f or '').strip().lower() for f in reader.fieldnames or []]
+        for line, row in enumerate(reader, start=2): yield line, row
+    elif name.endswith('.xlsx'):
+        try: from openpyxl import load_workbook
+        except ImportError: raise BulkError('Cần cài openpyxl để nhập file .xlsx')
+        workbook = load_workbook(file.stream, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(h or '').strip().lower() for h in next(rows, ())]
+            for line, values in enumerate(rows, start=2):
+                if any(v not in (None, '') for v in values): yield line, dict(zip(header, values))
+        finally:
+            workbook.close()
+    else:
+        raise BulkError('Chỉ hỗ trợ file .csv hoặc .xlsx')
+
+def _text(value):
+    return str(value).strip() if value is not None else ''
+
+def _parse_product(row):
+    """Chỉ các cột có giá trị mới được ghi; ô trống giữ nguyên dữ liệu cũ."""
+    sku = _text(row.get('sku'))
+    if not sku: raise ValueError('Thiếu sku')
+    fields = {}
+    for column in ('name', 'category', 'description', 'image_url'):
+        if _text(row.get(column)): fields[column] = _text(row.get(column))
+    for column in ('price', 'cost_price'):
+        if _text(row.get(column)):
+            try: fields[column] = Decimal(_text(row.get(column)).replace(',', '')).quantize(Decimal('0.01'))
+            except InvalidOperation: raise ValueError(f'{column} không hợp lệ')
+            if fields[column] < 0: raise ValueError(f'{column} không được âm')
+    for column in ('stock_quantity', 'min_stock'):
+        if _text(row.get(column)):
+            try: fields[column] = int(float(_text(row.get(column))))
+            except (ValueError, OverflowError): raise ValueError(f'{column} không hợp lệ')  # 'inf' -> OverflowError
+            if fields[column] < 0: raise ValueError(f'{column} không được âm')
+    return sku, fields
+
+def import_products(user, file):
+    """Thêm mới / cập nhật sản phẩm theo sku. Dòng lỗi bị bỏ qua và liệt kê trong kết quả."""
+    created = updated = 0
+    errors, changed, low_stock = [], set(), 0
+    reason = f'Nhập file {file.filename}'
+    for chunk in _chunks(read_rows(file), _chunk_size()):
+        rows = {}
+        for line, row in chunk:
+            try: sku, fields = _parse_product(row)
+            except ValueError as e: errors.append({'row': line, 'message': str(e)}); continue
+            rows[sku] = (line, dict(rows.get(sku, (0, {}))[1], **fields))  # sku lặp trong lô: gộp, dòng sau thắng
+        if not rows: continue
+        now = datetime.utcnow()
+        existing = {sku: (pid, qty, min_stock) for pid, sku, qty, min_stock in db.session.execute(
+            select(Product.id, Product.sku, Product.stock_quantity, Product.min_stock)
+            .where(Product.sku.in_(rows)).with_for_update())}
+
+        updates, inserts, logs, crossings = [], [], [], []
+        for sku, (line, fields) in rows.items():
+            if sku in existing:
+                pid, qty, min_stock = existing[sku]
+                if not fields: continue
+                updates.append(dict(fields, id=pid, updated_at=now))
+                new_qty, new_min = fields.get('stock_quantity', qty), fields.get('min_stock', min_stock)
+                crossings.append((qty, new_qty, min_stock, new_min))
+                if new_qty != qty:
+                    logs.append({'product_id': pid, 'change_type': 'adjustment', 'quantity_change': new_qty - (qty or 0),
+                                 'previous_quantity': qty, 'new_quantity': new_qty, 'reason': reason, 'user_id': user.id, 'created_at': now})
+            elif 'name' not in fields or 'price' not in fields:
+                errors.append({'row': line, 'message': 'Sản phẩm mới cần có name và price'})
+            else:
+                inserts.append({'sku': sku, 'name': fields['name'], 'price': fields['price'], 'category': fields.get('category'),
+                                'description': fields.get('description', ''), 'cost_price': fields.get('cost_price'),
+                                'stock_quantity': fields.get('stock_quantity', 0), 'min_stock': fields.get('min_stock', 10),
+                                'image_url': fields.get('image_url'), 'created_at': now, 'updated_at': now})
+
+        if updates: db.session.execute(update(Product), updates)
+        ids = [u['id'] for u in updates]
+        if inserts:
+            new_ids = dict(db.session.execute(insert(Product).returning(Product.sku, Product.id), inserts).all())
+            for row in inserts:
+                pid = new_ids[row['sku']]; ids.append(pid)
+                crossings.append((None, row['stock_quantity'], row['min_stock']))
+                if row['stock_quantity']:
+                    logs.append({'product_id': pid, 'change_type': 'increase', 'quantity_change': row['stock_quantity'],
+                                 'previous_quantity': 0, 'new_quantity': row['stock_quantity'], 'reason': reason,
+                                 'user_id': user.id, 'created_at': now})
+        if logs: db.session.execute(insert(InventoryLog), logs)
+        search.reindex('product', ids)
+        db.session.commit()
+        created += len(inserts); updated += len(updates); changed.update(ids)
+        low_stock += today_stats.low_stock_change(crossings)
+    _finish(user, len(changed), low_stock, {'source': 'import', 'reason': reason, 'created': created, 'updated': updated})
+    return {'created': created, 'updated': updated, 'skipped': len(errors), 'errors': errors[:MAX_ERRORS]}
@@ -0,0 +1,156 @@
+# catalog.py
+# Catalog sản phẩm (và danh sách khách hàng cho màn hình POS) cache trong bộ nhớ của worker, có phiên bản.
+# Làm mới tăng dần: chỉ đọc sản phẩm có updated_at mới hơn lần trước, đếm số dòng để phát hiện sản phẩm bị xoá.
+# Ghi trong tiến trình này đánh dấu cần làm mới ngay; thay đổi từ worker khác được thấy sau CATALOG_CACHE_TTL giây.
+# Client POS giữ bản sao cục bộ và chỉ lấy phần thay đổi qua /api/catalog?since=<version> (ETag = version).
+import itertools, os, threading, time
+from datetime import timedelta
+from flask import current_app
+from sqlalchemy import func, select
+from database import db
+from models import Product, Customer
+
+CLOCK_SKEW = timedelta(seconds=5)  # updated_at do từng worker tự ghi theo đồng hồ của mình
+MAX_TOMBSTONES = 10000
+
+class ProductRecord:
+    __slots__ = ('id', 'sku', 'name', 'category', 'price', 'stock_quantity', 'min_stock', 'image_url', 'version')
+    FIELDS = __slots__[:-1]  # các cột gửi cho client
+
+    def __init__(self, row):
+        self.id, self.sku, self.name, self.category = row.id, row.sku, row.name, row.category
+        self.price, self.stock_quantity, self.min_stock = float(row.price or 0), row.stock_quantity or 0, row.min_stock or 0
+        self.image_url, self.version = row.image_url, 0
+
+    def values(self):
+        return [getattr(self, f) for f in self.FIELDS]
+
+class CustomerRecord:
+    __slots__ = ('id', 'name', 'phone')
+
+    def __init__(self, row):
+        self.id, self.name, self.phone = row.id, row.name, row.phone
+
+_COLUMNS = (Product.id, Product.sku, Product.name, Product.category, Product.price, Product.stock_quantity,
+            Product.min_stock, Product.image_url, Product.updated_at)
+
+class Catalog:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.generation = os.urandom(4).hex()  # version chỉ có nghĩa trong tiến trình đã cấp nó
+        self.version, self._floor = 0, 0
+        self._products, self._tombstones = {}, {}  # id -> ProductRecord / id -> version lúc bị xoá
+        self._watermark, self._loaded, self._dirty, self._checked_at = None, False, True, 0.0
+        self._customers, self._customer_key = [], None
+        self._by_name, self._categories = None, None
+
+    @property
+    def token(self):
+        return f'{self.generation}.{self.version}'
+
+    def invalidate(self):
+        with self._lock: self._dirty = True
+
+    def refresh(self, ttl):
+        with self._lock:
+            if self._loaded and not self._dirty and time.monotonic() - self._checked_at < ttl: return
+            if self._loaded: changed, removed = self._load_changes()
+            else: changed, removed = self._load_all()
+            self._apply(changed, removed)
+            self._load_customers()
+            self._loaded, self._dirty, self._checked_at = True, False, time.monotonic()
+
+    def _load_all(self):
+        rows = db.session.execute(select(*_COLUMNS)).all()
+        self._advance(rows)
+        seen = {row.id for row in rows}
+        return self._diff(rows), [pid for pid in self._products if pid not in seen]
+
+    def _load_changes(self):
+        query = select(*_COLUMNS)
+        if self._watermark is not None: query = query.where(Product.updated_at >= self._watermark - CLOCK_SKEW)
+        rows = db.session.execute(query).all()
+        count = db.session.execute(select(func.count(Product.id))).scalar()
+        if len(self._products) + sum(row.id not in self._products for row in rows) != count:
+            return self._load_all()  # có sản phẩm bị xoá: so lại toàn bộ id
+        self._advance(rows)
+        return self._diff(rows), []
+
+    def _advance(self, rows):
+        stamps = [row.updated_at for row in rows if row.updated_at is not None]
+        if stamps: self._watermark = max(stamps + ([self._watermark] if self._watermark else []))
+
+    def _diff(self, rows):
+        changed = []
+        for row in rows:
+            record, current = ProductRecord(row), self._products.get(row.id)
+            if current is None or current.values() != record.values(): changed.append(record)
+        return changed
+
+    def _apply(self, changed, removed):
+        if not changed and not removed: return
+        self.version += 1
+        for record in changed:
+            record.version = self.version
+            self._products[record.id] = record
+            self._tombstones.pop(record.id, None)
+        for pid in removed:
+            del self._products[pid]
+            self._tombstones[pid] = self.version
+        if len(self._tombstones) > MAX_TOMBSTONES:
+            self._tombstones, self._floor = {}, self.version  # client cũ hơn mốc này nhận lại toàn bộ catalog
+        self._by_name, self._categories = None, None
+
+    def _load_customers(self):
+        key = tuple(db.session.execute(select(func.count(Customer.id), func.max(Customer.id))).one())
+        if key == self._customer_key: return
+        rows = db.session.execute(select(Customer.id, Customer.name, Customer.phone).order_by(Customer.name, Customer.id)).all()
+        self._customers, self._customer_key = [CustomerRecord(row) for row in rows], key
+
+    # Danh sách và ProductRecord được thay mới chứ không sửa tại chỗ nên trả thẳng cho nhiều request dùng chung
+    def by_name(self):
+        with self._lock:
+            if self._by_name is None: self._by_name = sorted(self._products.values(), key=lambda p: (p.name, p.id))
+            return self._by_name
+
+    def categories(self):
+        with self._lock:
+            if self._categories is None: self._categories = sorted({p.category for p in self._products.values() if p.category})
+            return self._categories
+
+    def customers(self):
+        with self._lock: return self._customers
+
+    def changes(self, since=None):
+        """(version, full, records, deleted_ids): phần thay đổi sau `since`, hoặc toàn bộ nếu không tính được delta."""
+        with self._lock:
+            generation, _, version = (since or '').partition('.')
+            full = generation != self.generation or not version.isdigit() or not self._floor <= int(version) <= self.version
+            after = 0 if full else int(version)
+            records = [p for p in self._products.values() if p.version > after]
+            deleted = [] if full else [pid for pid, v in self._tombstones.items() if v > after]
+            return self.token, full, records, deleted
+
+cache = Catalog()
+
+def _fresh():
+    cache.refresh(current_app.config.get('CATALOG_CACHE_TTL', 30))
+    return cache
+
+def invalidate():
+    cache.invalidate()
+
+def pos_products(limit):
+    return list(itertools.islice((p for p in _fresh().by_name() if p.stock_quantity > 0), limit))
+
+def categories():
+    return _fresh().categories()
+
+def customers():
+    return _fresh().customers()
+
+def changes(since=None):
+    version, full, records, deleted = _fresh().changes(since)
+    return {'version': version, 'full': full, 'columns': list(ProductRecord.FIELDS),
+            'products': [p.values() for p in sorted(records, key=lambda p: p.id)], 'deleted': sorted(deleted),
+            'categories': cache.categories()}
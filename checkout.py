@@ -0,0 +1,79 @@
+# checkout.py
+# Thanh toán đơn hàng với số round trip cố định: khoá sản phẩm bằng một truy vấn IN,
+# trừ kho bằng một câu UPDATE có điều kiện, ghi SaleItem/InventoryLog theo lô.
+from collections import OrderedDict
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from sqlalchemy import case, insert, update
+from database import db
+from models import Product, Sale, SaleItem, InventoryLog
+import catalog, customer_metrics, sales_summary, today_stats
+from sale_codes import next_sale_code
+
+class CheckoutError(Exception):
+    pass
+
+def _money(value, field='Số tiền'):
+    try: amount = Decimal(str(value or 0)).quantize(Decimal('0.01'))
+    except InvalidOperation: raise CheckoutError(f'{field} không hợp lệ')
+    if not amount.is_finite() or amount < 0: raise CheckoutError(f'{field} không hợp lệ')
+    return amount
+
+def _cart(items):
+    """Gộp các dòng trùng sản phẩm -> {product_id: (quantity, unit_price | None)}."""
+    if not isinstance(items, list): raise CheckoutError('Dòng sản phẩm không hợp lệ')
+    cart = OrderedDict()
+    for i in items:
+        try: pid, qty = int(i['product_id']), int(i['quantity'])
+        except (KeyError, TypeError, ValueError): raise CheckoutError('Dòng sản phẩm không hợp lệ')
+        if qty <= 0: raise CheckoutError('Số lượng phải lớn hơn 0')
+        price = _money(i['unit_price'], 'Đơn giá') if i.get('unit_price') not in (None, '') else None
+        prev_qty, prev_price = cart.get(pid, (0, None))
+        cart[pid] = (prev_qty + qty, price if price is not None else prev_price)
+    if not cart: raise CheckoutError('Đơn hàng chưa có sản phẩm')
+    return cart
+
+def checkout(user, items, customer_id=None, discount=0, tax=0, payment_method=None, notes=None):
+    cart = _cart(items)
+    discount, tax = _money(discount, 'Giảm giá'), _money(tax, 'Thuế')
+    sale_code = next_sale_code()  # trước mọi câu ghi: bộ cấp mã dùng transaction riêng
+    # SELECT ... FOR UPDATE (PostgreSQL); SQLite bỏ qua mệnh đề này nhưng chỉ cho một writer tại một thời điểm
+    products = {p.id: p for p in Product.query.filter(Product.id.in_(cart)).with_for_update().all()}
+    missing = [pid for pid in cart if pid not in products]
+    if missing: raise CheckoutError(f'Không tìm thấy sản phẩm #{missing[0]}')
+
+    qty_by_id = case({pid: qty for pid, (qty, _) in cart.items()}, value=Product.id)
+    result = db.session.execute(update(Product).where(Product.id.in_(cart), Product.stock_quantity >= qty_by_id)
+                                .values(stock_quantity=Product.stock_quantity - qty_by_id, updated_at=datetime.utcnow())
+                                .execution_options(synchronize_session=False))
+    if result.rowcount != len(cart):
+        db.session.rollback()
+        short = [products[pid].name for pid, (qty, _) in cart.items() if (products[pid].stock_quantity or 0) < qty]
+        raise CheckoutError(f'Không đủ hàng: {", ".join(short)}' if short else 'Tồn kho vừa thay đổi, vui lòng thử lại')
+
+    lines, subtotal = [], Decimal('0')
+    for pid, (qty, price) in cart.items():
+        price = price if price is not None else _money(products[pid].price)
+        lines.append((pid, qty, price, price * qty)); subtotal += price * qty
+    if discount > subtotal + tax:
+        db.session.rollback()
+        raise CheckoutError('Giảm giá vượt quá tổng tiền đơn hàng')
+    sale = Sale(sale_code=sale_code, customer_id=customer_id, user_id=user.id, total_amount=subtotal - discount + tax,
+                discount=discount, tax=tax, payment_method=payment_method, notes=notes, status='completed', sale_date=datetime.utcnow())
+    db.session.add(sale); db.session.flush()
+
+    db.session.execute(insert(SaleItem), [{'sale_id': sale.id, 'product_id': pid, 'quantity': qty, 'unit_price': price,
+                                           'total_price': total} for pid, qty, price, total in lines])
+    db.session.execute(insert(InventoryLog), [{'product_id': pid, 'change_type': 'stock_out', 'quantity_change': -qty,
+                                               'previous_quantity': products[pid].stock_quantity,
+                                               'new_quantity': products[pid].stock_quantity - qty, 'reason': f'Sale #{sale.sale_code}',
+                                               'reference': str(sale.id), 'user_id': user.id, 'created_at': sale.sale_date}
+                                              for pid, qty, _, _ in lines])
+    sales_summary.apply_sale(sale, items=sum(qty for _, qty, _, _ in lines))
+    customer_metrics.apply_sale(sale)
+    low_stock = today_stats.low_stock_change([(products[pid].stock_quantity, products[pid].stock_quantity - qty, products[pid].min_stock)
+                                              for pid, qty, _, _ in lines])
+    db.session.commit()
+    catalog.invalidate()
+    today_stats.record_sale(sale, low_stock=low_stock)
+    return sale
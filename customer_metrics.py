@@ -0,0 +1,46 @@
+# customer_metrics.py
+# Chỉ số tích luỹ của khách hàng (số đơn, tổng chi tiêu, lần mua gần nhất) lưu ngay trên bảng customers,
+# cập nhật cùng transaction với đơn hàng; danh sách khách hàng sắp xếp / lọc theo chúng bằng chỉ mục.
+from datetime import datetime
+from sqlalchemy import case, func, or_, select, update
+from database import db
+from models import Customer, Sale
+
+# sort -> (cột khoá keyset, giảm dần)
+SORTS = {
+    'name': ((Customer.name, Customer.id), False),
+    'spent': ((Customer.total_spent, Customer.id), True),
+    'orders': ((Customer.order_count, Customer.id), True),
+    'recent': ((Customer.last_purchase_at, Customer.id), True),
+}
+
+def _completed(exclude=None):
+    criteria = [Sale.customer_id == Customer.id, Sale.status == 'completed']
+    if exclude is not None: criteria.append(Sale.id != exclude)
+    return criteria
+
+def apply_sale(sale, sign=1):
+    """Cộng (sign=1) hoặc trừ (sign=-1) một đơn 'completed' vào chỉ số của khách hàng, trong transaction hiện tại."""
+    if not sale.customer_id: return
+    sale_date = sale.sale_date or datetime.utcnow()
+    values = {'order_count': Customer.order_count + sign, 'total_spent': Customer.total_spent + sign * (sale.total_amount or 0)}
+    if sign > 0:
+        values['last_purchase_at'] = case((or_(Customer.last_purchase_at.is_(None), Customer.last_purchase_at < sale_date), sale_date),
+                                          else_=Customer.last_purchase_at)
+    else:
+        # Huỷ đơn: lần mua gần nhất có thể là chính đơn này -> tính lại bằng chỉ mục (customer_id, sale_date)
+        values['last_purchase_at'] = select(func.max(Sale.sale_date)).where(*_completed(exclude=sale.id)).scalar_subquery()
+    db.session.execute(update(Customer).where(Customer.id == sale.customer_id).values(values)
+                       .execution_options(synchronize_session=False))
+
+def recompute_statement():
+    return update(Customer).values(
+        order_count=select(func.count(Sale.id)).where(*_completed()).scalar_subquery(),
+        total_spent=select(func.coalesce(func.sum(Sale.total_amount), 0)).where(*_completed()).scalar_subquery(),
+        last_purchase_at=select(func.max(Sale.sale_date)).where(*_completed()).scalar_subquery())
+
+def rebuild():
+    """Tính lại chỉ số cho mọi khách hàng từ bảng sales. Trả về số khách hàng đã cập nhật."""
+    result = db.session.execute(recompute_statement().execution_options(synchronize_session=False))
+    db.session.commit()
+    return result.rowcount
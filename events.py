@@ -0,0 +1,101 @@
+# events.py
+# Bus sự kiện real-time: phòng theo cửa hàng / theo trang, gộp inventory_update trong cửa sổ ~250ms,
+# và message queue (SOCKETIO_MESSAGE_QUEUE, ví dụ redis://...) để nhiều worker gunicorn dùng chung sự kiện.
+import threading
+from flask import current_app, has_app_context
+from flask_login import current_user
+from flask_socketio import SocketIO, emit, join_room, leave_room
+
+socketio = SocketIO()
+
+PAGES = ('dashboard', 'products', 'inventory', 'sales', 'pos')
+INVENTORY_PAGES = ('inventory', 'products', 'pos')
+
+def current_store():
+    return current_app.config.get('STORE_ID', 'main') if has_app_context() else 'main'
+
+def store_room(store):
+    return f'store:{store}'
+
+def page_room(store, page):
+    return f'store:{store}:page:{page}'
+
+class InventoryBatcher:
+    """Gộp các thay đổi tồn kho theo sản phẩm; mỗi cửa sổ chỉ phát một message cho mỗi cửa hàng."""
+    def __init__(self, window=0.25):
+        self.window = window
+        self._lock = threading.Lock()
+        self._pending, self._alerts, self._scheduled = {}, {}, False
+
+    def add(self, store, update, alert=None):
+        key = (store, update['product_id'])
+        with self._lock:
+            prev = self._pending.get(key)
+            if prev: update = dict(update, change=prev['change'] + update['change'], previous_quantity=prev['previous_quantity'])
+            self._pending[key] = update
+            if alert: self._alerts[key] = alert
+            else: self._alerts.pop(key, None)
+            schedule = not self._scheduled and self.window > 0
+            self._scheduled = self._scheduled or schedule
+        if self.window <= 0: self.flush()
+        elif schedule: socketio.start_background_task(self._flush_later)
+
+    def _flush_later(self):
+        socketio.sleep(self.window)
+        self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, alerts = self._pending, self._alerts
+            self._pending, self._alerts, self._scheduled = {}, {}, False
+        by_store = {}
+        for (store, _), update in pending.items(): by_store.setdefault(store, []).append(update)
+        for store, updates in by_store.items():
+            socketio.emit('inventory_update', {'updates': updates, 'count': len(updates)},
+                          to=[page_room(store, page) for page in INVENTORY_PAGES])
+        for (store, _), alert in alerts.items():
+            socketio.emit('stock_update', alert, to=store_room(store))
+
+batcher = InventoryBatcher()
+
+def init_app(app):
+    batcher.window = app.config.get('SOCKETIO_BATCH_WINDOW', 0.25)
+    socketio.init_app(app, cors_allowed_origins=app.config.get('SOCKETIO_CORS_ORIGINS', '*'),
+                      message_queue=app.config.get('SOCKETIO_MESSAGE_QUEUE'), async_mode=app.config.get('SOCKETIO_ASYNC_MODE'))
+
+# ===== PUBLISH =====
+def publish_inventory(product, change, reason, user):
+    update = {'product_id': product.id, 'product_name': product.name, 'sku': product.sku, 'change': change,
+              'new_quantity': product.stock_quantity, 'previous_quantity': product.stock_quantity - change,
+              'min_stock': product.min_stock, 'reason': reason, 'user': user.username}
+    alert = None
+    if product.stock_quantity <= product.min_stock:
+        alert = {'type': 'low_stock', 'product_id': product.id, 'product_name': product.name, 'sku': product.sku,
+                 'quantity': product.stock_quantity, 'min_stock': product.min_stock}
+    batcher.add(current_store(), update, alert)
+
+def publish_inventory_bulk(summary):
+    # Điều chỉnh / nhập hàng loạt: một sự kiện tóm tắt thay cho hàng nghìn inventory_update
+    store = current_store()
+    socketio.emit('inventory_bulk', summary, to=[page_room(store, page) for page in INVENTORY_PAGES])
+
+def publish_sale(payload):
+    socketio.emit('sale_update', payload, to=store_room(current_store()))
+
+def publish_today(delta):
+    socketio.emit('today_delta', delta, to=page_room(current_store(), 'dashboard'))
+
+# ===== HANDLERS =====
+@socketio.on('connect')
+def handle_connect(auth=None):
+    if not current_user.is_authenticated: return False
+    join_room(store_room(current_store()))
+    emit('connected', {'user_id': current_user.id, 'username': current_user.username})
+
+@socketio.on('join_page')
+def handle_join_page(page):
+    if not current_user.is_authenticated or page not in PAGES: return False
+    for other in PAGES:
+        if other != page: leave_room(page_room(current_store(), other))
+    join_room(page_room(current_store(), page))
+    return True
@@ -0,0 +1,73 @@
+# exports.py
+# Xuất dữ liệu dạng stream (CSV / NDJSON, tuỳ chọn gzip): đọc theo lô bằng server-side cursor, ghi tới đâu gửi tới đó.
+import csv, io, json, zlib
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from flask import Response, stream_with_context
+from sqlalchemy import func
+from database import db
+from models import Product, Sale, SaleItem, Customer, User
+
+FORMATS = {'csv': 'text/csv; charset=utf-8', 'ndjson': 'application/x-ndjson; charset=utf-8'}
+BATCH_SIZE = 1000
+
+def _plain(v):
+    if isinstance(v, Decimal): return float(v)
+    if isinstance(v, datetime): return v.strftime('%d/%m/%Y %H:%M')
+    if isinstance(v, date): return v.strftime('%d/%m/%Y')
+    return v
+
+# ===== TRUY VẤN DÙNG CHUNG (stream CSV và job XLSX) =====
+SALES_LINE_COLUMNS = ['sale_code', 'date', 'user', 'customer', 'sku', 'product', 'quantity', 'unit_price', 'total_price', 'status']
+INVENTORY_COLUMNS = ['name', 'sku', 'category', 'price', 'stock', 'min_stock', 'status', 'value']
+
+def sales_lines_query(start, end):
+    return db.session.query(Sale.sale_code, Sale.sale_date, User.username, func.coalesce(Customer.name, 'Khách lẻ'), Product.sku,
+                            Product.name, SaleItem.quantity, SaleItem.unit_price, SaleItem.total_price, Sale.status) \
+        .select_from(SaleItem).join(Sale, Sale.id == SaleItem.sale_id).join(Product, Product.id == SaleItem.product_id) \
+        .join(User, User.id == Sale.user_id).outerjoin(Customer, Customer.id == Sale.customer_id) \
+        .filter(Sale.sale_date >= datetime.combine(start, datetime.min.time()),
+                Sale.sale_date < datetime.combine(end + timedelta(days=1), datetime.min.time())) \
+        .order_by(Sale.sale_date, Sale.id, SaleItem.id)
+
+def inventory_query():
+    status = db.case((Product.stock_quantity == 0, 'Hết hàng'), (Product.stock_quantity <= Product.min_stock, 'Sắp hết'), else_='Đủ hàng')
+    return db.session.query(Product.name, Product.sku, Product.category, Product.price, Product.stock_quantity, Product.min_stock,
+                            status, Product.stock_quantity * Product.price).order_by(Product.name, Product.id)
+
+def iter_rows(query, batch_size=BATCH_SIZE):
+    # stream_results: psycopg2 dùng named cursor; yield_per: ORM chỉ giữ một lô trong bộ nhớ
+    return query.execution_options(stream_results=True, yield_per=batch_size)
+
+def encode(rows, columns, fmt, batch_size=BATCH_SIZE):
+    """Sinh từng khối văn bản; `rows` là các tuple cùng thứ tự với `columns`."""
+    buf = io.StringIO()
+    if fmt == 'csv':
+        buf.write('\ufeff')  # BOM để Excel nhận UTF-8
+        writer = csv.writer(buf)
+        writer.writerow(columns)
+    for n, row in enumerate(rows, 1):
+        values = [_plain(v) for v in row]
+        if fmt == 'csv': writer.writerow(values)
+        else: buf.write(json.dumps(dict(zip(columns, values)), ensure_ascii=False) + '\n')
+        if n % batch_size == 0:
+            yield buf.getvalue(); buf.seek(0); buf.truncate()
+    if buf.tell(): yield buf.getvalue()
+
+def gzip_chunks(chunks):
+    z = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> định dạng gzip
+    for chunk in chunks:
+        data = z.compress(chunk.encode('utf-8'))
+        if data: yield data
+    yield z.flush()
+
+def stream_response(query, columns, fmt, filename, gzip=False):
+    if fmt not in FORMATS: fmt = 'csv'
+    chunks = encode(iter_rows(query), columns, fmt)
+    headers = {'Content-Disposition': f'attachment; filename={filename}.{fmt}', 'X-Accel-Buffering': 'no', 'Vary': 'Accept-Encoding'}
+    if gzip:
+        chunks = gzip_chunks(chunks)
+        headers['Content-Encoding'] = 'gzip'
+    else:
+        chunks = (c.encode('utf-8') for c in chunks)
+    return Response(stream_with_context(chunks), content_type=FORMATS[fmt], headers=headers)
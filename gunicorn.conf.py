@@ -0,0 +1,19 @@
+# gunicorn.conf.py
+# Cấu hình gunicorn production, đọc từ biến môi trường.
+# Socket.IO (long-polling / websocket) giữ kết nối lâu nên cần worker bất đồng bộ (eventlet mặc định, hoặc gevent
+# nếu đã cài gevent + psycogreen); worker sync chỉ phục vụ được một kết nối mỗi lúc.
+# Nhiều worker (WEB_CONCURRENCY > 1) cần sticky session ở load balancer và SOCKETIO_MESSAGE_QUEUE.
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'eventlet')
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+accesslog = '-'
+
+# Flask-SocketIO phải dùng cùng mô hình async với worker
+os.environ.setdefault('SOCKETIO_ASYNC_MODE', worker_class if worker_class in ('eventlet', 'gevent') else 'threading')
+os.environ.setdefault('FLASK_ENV', 'production')
@@ -0,0 +1,154 @@
+# http_cache.py
+# Cache phản hồi cho các trang danh sách / chi tiết:
+# - GET có điều kiện: ETag / Last-Modified tính từ phiên bản dữ liệu (count / max(updated_at) qua chỉ mục),
+#   trả 304 mà không truy vấn danh sách hay render template.
+# - {% cache 'tên' %}...{% endcache %}: fragment HTML đã render, cache trong worker theo (vai trò, phiên bản dữ liệu,
+#   tham số trang). Dữ liệu truyền cho template dưới dạng deferred nên fragment trúng cache thì truy vấn không chạy.
+# - Biên dịch sẵn mọi template lúc khởi động worker.
+import hashlib, os, threading
+from collections import OrderedDict
+from datetime import timezone
+from functools import wraps
+from flask import Response, g, has_request_context, make_response, request, session
+from flask_login import current_user
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+from sqlalchemy import func, select
+from werkzeug.http import is_resource_modified
+from database import db
+from models import Product, Sale, SaleItem
+import today_stats
+
+_templates_version = None  # đổi template khi deploy -> ETag cũ không còn khớp
+
+# ===== PHIÊN BẢN DỮ LIỆU =====
+def _latest(*stamps):
+    stamps = [s for s in stamps if s is not None]
+    return max(stamps) if stamps else None
+
+def products_version():
+    count, updated = db.session.execute(select(func.count(Product.id), func.max(Product.updated_at))).one()
+    return ('products', count, updated), updated
+
+def sales_version():
+    # Đơn hàng không bị xoá: id lớn nhất bắt đơn mới, updated_at bắt đổi trạng thái
+    last_id, updated = db.session.execute(select(func.max(Sale.id), func.max(Sale.updated_at))).one()
+    return ('sales', last_id, updated), updated
+
+def inventory_version():
+    (products, p_updated), (sales, s_updated) = products_version(), sales_version()
+    return (products, sales, today_stats.today()), _latest(p_updated, s_updated)  # "bán 30 ngày qua" trượt theo ngày
+
+def sale_version(id):
+    # Trang chi tiết còn hiện tên / SKU sản phẩm: lấy thêm updated_at mới nhất của các sản phẩm trong đơn
+    g.sale = sale = Sale.query.get_or_404(id)  # view dùng lại, không truy vấn lần hai
+    products = db.session.execute(select(func.max(Product.updated_at)).join(SaleItem, SaleItem.product_id == Product.id)
+                                  .where(SaleItem.sale_id == sale.id)).scalar()
+    return ('sale', sale.id, sale.status, sale.updated_at, products), _latest(sale.updated_at, sale.sale_date, products)
+
+# ===== GET CÓ ĐIỀU KIỆN =====
+def _digest(*parts):
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+def conditional(version):
+    """version(**view_args) -> (các phần phiên bản, Last-Modified hoặc None). Đặt sau @login_required."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            parts, last_modified = version(*args, **kwargs)
+            g.cache_version = (parts, sorted(request.args.items(multi=True)))
+            if '_flashes' in session: return view(*args, **kwargs)  # flash chỉ hiện một lần, không trả 304
+            # Trang có tên người dùng ở thanh menu nên ETag theo từng người
+            etag = _digest(request.endpoint, g.cache_version, current_user.id, current_user.role, _templates_version)
+            if last_modified is not None: last_modified = last_modified.replace(tzinfo=timezone.utc)
+            if not is_resource_modified(request.environ, etag, last_modified=last_modified):
+                response = Response(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200: return response
+            response.set_etag(etag)
+            if last_modified is not None: response.last_modified = last_modified
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
+
+# ===== FRAGMENT =====
+class Deferred:
+    """Giá trị chỉ tính khi template dùng tới lần đầu (rồi giữ lại cho các lần sau)."""
+    __slots__ = ('_fn', '_value', '_done')
+
+    def __init__(self, fn):
+        self._fn, self._value, self._done = fn, None, False
+
+    def _get(self):
+        if not self._done: self._value, self._done = self._fn(), True
+        return self._value
+
+    def __getattr__(self, name): return getattr(self._get(), name)
+    def __iter__(self): return iter(self._get())
+    def __len__(self): return len(self._get())
+    def __bool__(self): return bool(self._get())
+    def __getitem__(self, key): return self._get()[key]
+    def __contains__(self, item): return item in self._get()
+    def __str__(self): return str(self._get())
+
+class FragmentCache:
+    """LRU giới hạn theo tổng số byte HTML."""
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes, self.size = max_bytes, 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None: self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if len(value) > self.max_bytes: return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None: self.size -= len(old)
+            self._entries[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes: self.size -= len(self._entries.popitem(last=False)[1])
+
+    def clear(self):
+        with self._lock: self._entries.clear(); self.size = 0
+
+fragments = FragmentCache()
+
+class FragmentCacheExtension(Extension):
+    """{% cache 'tên' %}...{% endcache %} — chỉ cache khi view có @conditional (đã biết phiên bản dữ liệu)."""
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression(), nodes.Const(parser.name)]
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(self.call_method('_render', args), [], [], body).set_lineno(lineno)
+
+    def _render(self, name, template, caller):
+        version = g.get('cache_version') if has_request_context() else None
+        if version is None: return caller()
+        key = _digest(template, name, request.endpoint, current_user.role, version)
+        html = fragments.get(key)
+        if html is None:
+            html = str(caller())
+            fragments.set(key, html)
+        return Markup(html)
+
+# ===== KHỞI TẠO =====
+def init_app(app):
+    global _templates_version
+    fragments.max_bytes = app.config.get('FRAGMENT_CACHE_BYTES', fragments.max_bytes)
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    names = [n for n in app.jinja_env.list_templates() if n.endswith('.html')]
+    if app.config.get('TEMPLATE_WARMUP', True):
+        for name in names: app.jinja_env.get_template(name)  # biên dịch một lần khi worker khởi động
+    folder = os.path.join(app.root_path, app.template_folder)
+    _templates_version = max((os.path.getmtime(os.path.join(folder, n)) for n in names
+                              if os.path.exists(os.path.join(folder, n))), default=None)
@@ -0,0 +1,112 @@
+# instrumentation.py
+# Đo SQL theo từng request (bật bằng SQL_PROFILING=1): số truy vấn, tổng thời gian DB, câu chậm nhất theo endpoint.
+# Kết quả trả về qua header Server-Timing và /api/metrics (định dạng Prometheus).
+import heapq, logging, threading, time
+from collections import Counter, defaultdict
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from database import db
+
+logger = logging.getLogger(__name__)
+
+SLOW_STATEMENTS_KEPT = 5
+
+class EndpointStats:
+    __slots__ = ('requests', 'request_seconds', 'queries', 'db_seconds', 'max_queries', 'slowest')
+
+    def __init__(self):
+        self.requests, self.request_seconds, self.queries, self.db_seconds, self.max_queries = 0, 0.0, 0, 0.0, 0
+        self.slowest = []  # min-heap (seconds, statement)
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.endpoints = defaultdict(EndpointStats)
+
+    def record(self, endpoint, request_seconds, queries, db_seconds, statements):
+        with self._lock:
+            s = self.endpoints[endpoint]
+            s.requests += 1; s.request_seconds += request_seconds
+            s.queries += queries; s.db_seconds += db_seconds; s.max_queries = max(s.max_queries, queries)
+            for item in statements:
+                if len(s.slowest) < SLOW_STATEMENTS_KEPT: heapq.heappush(s.slowest, item)
+                elif item[0] > s.slowest[0][0]: heapq.heapreplace(s.slowest, item)
+
+    def snapshot(self):
+        with self._lock:
+            return {name: (s.requests, s.request_seconds, s.queries, s.db_seconds, s.max_queries, sorted(s.slowest, reverse=True))
+                    for name, s in self.endpoints.items()}
+
+    def reset(self):
+        with self._lock: self.endpoints.clear()
+
+registry = Registry()
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+def render_prometheus():
+    lines = []
+    metrics = [('salespro_requests_total', 'counter', 'Số request', 0),
+               ('salespro_request_seconds_total', 'counter', 'Tổng thời gian xử lý request', 1),
+               ('salespro_db_queries_total', 'counter', 'Tổng số câu SQL', 2),
+               ('salespro_db_seconds_total', 'counter', 'Tổng thời gian chờ DB', 3),
+               ('salespro_db_queries_max', 'gauge', 'Số câu SQL lớn nhất trong một request', 4)]
+    snap = registry.snapshot()
+    for name, kind, help_text, idx in metrics:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+        lines += [f'{name}{{endpoint="{_label(ep)}"}} {values[idx]}' for ep, values in sorted(snap.items())]
+    lines += ['# HELP salespro_slow_query_seconds Các câu SQL chậm nhất theo endpoint', '# TYPE salespro_slow_query_seconds gauge']
+    for ep, values in sorted(snap.items()):
+        lines += [f'salespro_slow_query_seconds{{endpoint="{_label(ep)}",statement="{_label(stmt[:200])}"}} {sec:.6f}'
+                  for sec, stmt in values[5]]
+    return '\n'.join(lines) + '\n'
+
+# ===== HOOKS =====
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'sql_stats' in g:
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if not (has_request_context() and 'sql_stats' in g) or not conn.info.get('query_start'): return
+    elapsed = time.perf_counter() - conn.info['query_start'].pop()
+    stats = g.sql_stats
+    stats['count'] += 1; stats['seconds'] += elapsed; stats['statements'][statement] += 1
+    if elapsed * 1000 >= stats['slow_ms']: stats['slow'].append((elapsed, statement))
+
+def _before_request():
+    g.sql_stats = {'count': 0, 'seconds': 0.0, 'statements': Counter(), 'slow': [], 'started': time.perf_counter(),
+                   'slow_ms': current_app.config.get('SLOW_QUERY_MS', 100),
+                   'n_plus_one': current_app.config.get('N_PLUS_ONE_THRESHOLD', 10)}
+
+def _finish(stats, endpoint):
+    total = time.perf_counter() - stats['started']
+    registry.record(endpoint, total, stats['count'], stats['seconds'], stats['slow'])
+    repeated = stats['statements'].most_common(1)
+    if repeated and repeated[0][1] >= stats['n_plus_one']:
+        logger.warning('Nghi N+1 tại %s: câu SQL lặp %d lần: %s', endpoint, repeated[0][1], repeated[0][0][:200])
+    return total
+
+def _after_request(response):
+    stats = g.get('sql_stats')
+    if stats is None: return response
+    endpoint = request.endpoint or 'unknown'
+    if response.is_streamed:
+        # Body (và các câu SQL đọc dữ liệu cho nó) chạy sau hook này: để g.sql_stats tiếp tục đếm, chốt khi response đóng.
+        # Header đã gửi trước body nên không có số liệu đầy đủ; xem /api/metrics.
+        response.call_on_close(lambda: _finish(stats, endpoint))
+        response.headers.add('Server-Timing', 'app;desc="streamed"')
+        return response
+    g.pop('sql_stats')
+    total = _finish(stats, endpoint)
+    response.headers.add('Server-Timing', f'db;dur={stats["seconds"] * 1000:.1f};desc="{stats["count"]} queries"')
+    response.headers.add('Server-Timing', f'app;dur={total * 1000:.1f}')
+    return response
+
+def init_app(app):
+    if not app.config.get('SQL_PROFILING'): return
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(db.engine, 'after_cursor_execute', _after_cursor_execute)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
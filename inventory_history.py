@@ -0,0 +1,113 @@
+# inventory_history.py
+# Lịch sử tồn kho mà không phải đọc lại toàn bộ inventory_logs:
+# - archive(before): chuyển log cũ sang inventory_logs_archive theo lô, mỗi lô một transaction
+#   (PostgreSQL: bảng lưu trữ phân vùng theo tháng, phân vùng được tạo khi cần; SQLite: bảng thường).
+# - take_snapshot(): chép tồn kho hiện tại của mọi sản phẩm vào stock_snapshots (chạy định kỳ, ví dụ mỗi đêm).
+# - prune_snapshots(before): xoá snapshot cũ hơn mốc lưu trữ; ngày cũ hơn vẫn tra được từ snapshot còn giữ + log lưu trữ.
+# - stock_as_of(at): snapshot gần `at` nhất cộng/trừ phần log nằm giữa hai mốc.
+from datetime import datetime
+from sqlalchemy import DateTime, delete, func, insert, literal, or_, select, text, union_all
+from database import db
+from models import Product, InventoryLog, InventoryLogArchive, StockSnapshot
+
+LOG_COLUMNS = ('id', 'product_id', 'change_type', 'quantity_change', 'previous_quantity', 'new_quantity',
+               'reason', 'reference', 'created_at', 'user_id')
+
+def _month_start(value):
+    return datetime(value.year, value.month, 1)
+
+def _next_month(value):
+    return datetime(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+def partition_name(month):
+    return f'inventory_logs_archive_y{month.year}m{month.month:02d}'
+
+def ensure_partitions(start, end):
+    """PostgreSQL: tạo phân vùng tháng cho khoảng [start, end] nếu chưa có."""
+    if db.engine.dialect.name != 'postgresql': return
+    month = _month_start(start)
+    while month <= end:
+        db.session.execute(text(f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF inventory_logs_archive "
+                                f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{_next_month(month):%Y-%m-%d}')"))
+        month = _next_month(month)
+
+# ===== LƯU TRỮ =====
+def archive(before, batch=5000):
+    """Chuyển các dòng log có created_at < before sang bảng lưu trữ. Trả về số dòng đã chuyển."""
+    hot, cold = InventoryLog.__table__, InventoryLogArchive.__table__
+    moved = 0
+    while True:
+        oldest = select(hot.c.id, hot.c.created_at).where(hot.c.created_at < before).order_by(hot.c.id).limit(batch).subquery()
+        count, last_id, low, high = db.session.execute(
+            select(func.count(), func.max(oldest.c.id), func.min(oldest.c.created_at), func.max(oldest.c.created_at))).one()
+        if not count: return moved
+        # Cùng điều kiện cho INSERT và DELETE: đúng `count` dòng cũ nhất, không cần danh sách id
+        rows = (hot.c.created_at < before) & (hot.c.id <= last_id)
+        ensure_partitions(low, high)
+        db.session.execute(insert(cold).from_select(LOG_COLUMNS, select(*[hot.c[name] for name in LOG_COLUMNS]).where(rows)))
+        db.session.execute(delete(hot).where(rows))
+        db.session.commit()
+        moved += count
+
+# ===== SNAPSHOT =====
+def take_snapshot(at=None):
+    """Ghi tồn kho hiện tại của mọi sản phẩm. Trả về số dòng snapshot."""
+    at = at or datetime.utcnow()
+    result = db.session.execute(insert(StockSnapshot).from_select(
+        ['taken_at', 'product_id', 'stock_quantity'],
+        select(literal(at, DateTime), Product.id, func.coalesce(Product.stock_quantity, 0))))
+    db.session.commit()
+    return result.rowcount
+
+def prune_snapshots(before):
+    """Xoá các snapshot chụp trước `before`, mỗi lần chụp một transaction. Trả về số dòng đã xoá."""
+    removed = 0
+    for taken_at, in db.session.execute(select(StockSnapshot.taken_at).where(StockSnapshot.taken_at < before)
+                                        .distinct().order_by(StockSnapshot.taken_at)).all():
+        removed += db.session.execute(delete(StockSnapshot).where(StockSnapshot.taken_at == taken_at)).rowcount
+        db.session.commit()
+    return removed
+
+def _snapshot(taken_at, product_ids):
+    query = select(StockSnapshot.product_id, StockSnapshot.stock_quantity).where(StockSnapshot.taken_at == taken_at)
+    if product_ids is not None: query = query.where(StockSnapshot.product_id.in_(product_ids))
+    return dict(db.session.execute(query).all())
+
+def _changes(start, end, product_ids):
+    """{product_id: tổng quantity_change} với start < created_at <= end, trên cả bảng nóng và bảng lưu trữ."""
+    parts = []
+    for table in (InventoryLog.__table__, InventoryLogArchive.__table__):
+        query = select(table.c.product_id, table.c.quantity_change).where(table.c.created_at > start)
+        if end is not None: query = query.where(table.c.created_at <= end)
+        if product_ids is not None: query = query.where(table.c.product_id.in_(product_ids))
+        parts.append(query)
+    logs = union_all(*parts).subquery()
+    return {pid: int(total or 0) for pid, total in
+            db.session.execute(select(logs.c.product_id, func.sum(logs.c.quantity_change)).group_by(logs.c.product_id))}
+
+def stock_as_of(at, product_ids=None):
+    """{product_id: tồn kho tại thời điểm `at`} cho các sản phẩm đã tồn tại lúc đó."""
+    products = select(Product.id, Product.stock_quantity).where(or_(Product.created_at.is_(None), Product.created_at <= at))
+    if product_ids is not None: products = products.where(Product.id.in_(product_ids))
+    current = {pid: qty or 0 for pid, qty in db.session.execute(products)}
+    ids = list(current) if product_ids is not None else None
+    before = db.session.query(func.max(StockSnapshot.taken_at)).filter(StockSnapshot.taken_at <= at).scalar()
+    after = db.session.query(func.min(StockSnapshot.taken_at)).filter(StockSnapshot.taken_at > at).scalar()
+
+    result = {}
+    if before is not None:
+        # Tiến từ snapshot trước `at`
+        changes = _changes(before, at, ids)
+        result.update((pid, qty + changes.get(pid, 0)) for pid, qty in _snapshot(before, ids).items() if pid in current)
+    remaining = [pid for pid in current if pid not in result]
+    if remaining and after is not None:
+        # Lùi từ snapshot sau `at` (sản phẩm chưa có trong snapshot trước)
+        base = _snapshot(after, remaining)
+        changes = _changes(at, after, remaining)
+        result.update((pid, qty - changes.get(pid, 0)) for pid, qty in base.items())
+        remaining = [pid for pid in remaining if pid not in result]
+    if remaining:
+        # Không có snapshot nào dùng được: lùi từ tồn kho hiện tại
+        changes = _changes(at, None, remaining)
+        result.update((pid, current[pid] - changes.get(pid, 0)) for pid in remaining)
+    return result
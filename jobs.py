@@ -0,0 +1,170 @@
+# jobs.py
+# Tạo báo cáo / file XLSX ở nền trên thread pool của tiến trình, không cần broker.
+# Trạng thái job ghi thành file JSON trong EXPORT_DIR/jobs nên worker nào cũng trả lời được khi client hỏi.
+# Kết quả lưu ở EXPORT_DIR/cache theo (loại, kỳ báo cáo): lần tải sau phục vụ thẳng file tĩnh
+# nếu dữ liệu nguồn chưa đổi kể từ lúc bắt đầu tạo file và file chưa quá EXPORT_CACHE_TTL giây.
+import json, logging, os, re, threading, time, uuid
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from flask import current_app
+from sqlalchemy import func
+from database import db
+from models import Product, DailySalesSummary
+import exports, reporting
+
+logger = logging.getLogger(__name__)
+
+JOB_RETENTION = 24 * 3600
+
+_lock = threading.Lock()
+_executor = None
+_active = {}  # khoá cache -> id job đang chạy trong tiến trình này
+
+# ===== XLSX =====
+def _cell(value):
+    return float(value) if isinstance(value, Decimal) else value
+
+def write_xlsx(path, sheets):
+    """sheets: [(tên sheet, cột, các dòng)]. Chế độ write_only ghi từng dòng ra đĩa, không giữ cả bảng trong RAM."""
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+    for title, columns, rows in sheets:
+        sheet = workbook.create_sheet(title[:31])
+        sheet.append(columns)
+        for row in rows: sheet.append([_cell(v) for v in row])
+    workbook.save(path)
+
+# ===== LOẠI JOB =====
+def _period(args):
+    start, end = reporting.period_range(args.get('period') or 'month', args.get('start_date'), args.get('end_date'))
+    return {'start': start.isoformat(), 'end': end.isoformat()}
+
+def _dates(params):
+    return date.fromisoformat(params['start']), date.fromisoformat(params['end'])
+
+def _sales_version(params):
+    start, end = _dates(params)
+    return db.session.query(func.max(DailySalesSummary.updated_at)).filter(DailySalesSummary.day.between(start, end)).scalar()
+
+def _stock_version(params):
+    return db.session.query(func.max(Product.updated_at)).scalar()
+
+def _report_params(args):
+    if args.get('report_type') not in reporting.REPORTS: raise ValueError('Loại báo cáo không hợp lệ')
+    params = {'report_type': args['report_type']}
+    if args['report_type'] != 'inventory_report': params.update(_period(args))
+    return params
+
+def _report_sheets(params):
+    start, end = _dates(params) if 'start' in params else (None, None)
+    data = reporting.REPORTS[params['report_type']](start, end)
+    return [(name, list(rows[0]) if rows else [], (list(row.values()) for row in rows)) for name, rows in data.items()]
+
+def _report_version(params):
+    return _stock_version(params) if params['report_type'] == 'inventory_report' else _sales_version(params)
+
+JobType = namedtuple('JobType', 'params sheets version')
+
+JOB_TYPES = {
+    'report': JobType(_report_params, _report_sheets, _report_version),
+    'sales_export': JobType(_period, lambda p: [('sales', exports.SALES_LINE_COLUMNS,
+                                                 exports.iter_rows(exports.sales_lines_query(*_dates(p))))], _sales_version),
+    'inventory_export': JobType(lambda args: {}, lambda p: [('inventory', exports.INVENTORY_COLUMNS,
+                                                            exports.iter_rows(exports.inventory_query()))], _stock_version),
+}
+
+# ===== LƯU TRỮ =====
+def _dir(name):
+    path = os.path.join(current_app.config.get('EXPORT_DIR') or os.path.join(current_app.instance_path, 'exports'), name)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def cache_key(kind, params):
+    return re.sub(r'[^A-Za-z0-9_]', '', '_'.join([kind, *map(str, params.values())]))
+
+def result_path(job):
+    return os.path.join(_dir('cache'), f'{job["key"]}.xlsx')
+
+def _state_path(job_id):
+    return os.path.join(_dir('jobs'), f'{job_id}.json')
+
+def _now():
+    return datetime.utcnow().isoformat()
+
+def _save(job):
+    path = _state_path(job['id'])
+    with open(f'{path}.tmp', 'w', encoding='utf-8') as f: json.dump(job, f, ensure_ascii=False)
+    os.replace(f'{path}.tmp', path)
+
+def get(job_id):
+    if not re.fullmatch(r'[0-9a-f]{32}', job_id or ''): return None
+    try:
+        with open(_state_path(job_id), encoding='utf-8') as f: return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _fresh(path, version):
+    try: mtime = os.path.getmtime(path)
+    except OSError: return False
+    if time.time() - mtime > current_app.config.get('EXPORT_CACHE_TTL', 3600): return False
+    return version is None or mtime >= version.replace(tzinfo=timezone.utc).timestamp()
+
+def _prune():
+    cutoff = time.time() - JOB_RETENTION
+    for name in ('jobs', 'cache'):
+        for entry in os.scandir(_dir(name)):
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                try: os.remove(entry.path)
+                except OSError: pass
+
+# ===== CHẠY JOB =====
+def _pool(app):
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=app.config.get('JOB_WORKERS', 2), thread_name_prefix='job')
+        return _executor
+
+def submit(kind, args, user):
+    """Tạo job; nếu file kết quả trong cache còn dùng được thì job hoàn thành ngay. Lỗi tham số -> ValueError."""
+    if kind not in JOB_TYPES: raise ValueError('Loại job không hợp lệ')
+    spec = JOB_TYPES[kind]
+    params = spec.params(args)
+    job = {'id': uuid.uuid4().hex, 'type': kind, 'params': params, 'key': cache_key(kind, params), 'status': 'queued',
+           'user_id': user.id, 'created_at': _now(), 'started_at': None, 'finished_at': None, 'error': None, 'cached': False}
+    if _fresh(result_path(job), spec.version(params)):
+        job.update(status='done', finished_at=_now(), cached=True)
+        _save(job)
+        return job
+    with _lock:
+        running = get(_active.get(job['key']))
+        if running and running['status'] in ('queued', 'running') and running['user_id'] == user.id: return running
+        _active[job['key']] = job['id']
+    _prune()
+    _save(job)
+    app = current_app._get_current_object()
+    _pool(app).submit(_run, app, dict(job))
+    return job
+
+def _run(app, job):
+    with app.app_context():
+        started = time.time()
+        job.update(status='running', started_at=_now()); _save(job)
+        path = result_path(job)
+        tmp = f'{path}.{job["id"]}.tmp'
+        try:
+            write_xlsx(tmp, JOB_TYPES[job['type']].sheets(job['params']))
+            os.replace(tmp, path)
+            os.utime(path, (started, started))  # mốc so với phiên bản dữ liệu là lúc bắt đầu đọc
+            job.update(status='done')
+        except Exception as e:
+            logger.exception('Job %s (%s) lỗi', job['id'], job['type'])
+            job.update(status='failed', error=str(e))
+            if os.path.exists(tmp): os.remove(tmp)
+        finally:
+            job['finished_at'] = _now()
+            _save(job)
+            with _lock:
+                if _active.get(job['key']) == job['id']: del _active[job['key']]
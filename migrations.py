@@ -0,0 +1,295 @@
+# migrations.py
+# Migration có đánh số phiên bản thay cho db.create_all(); các phiên bản đã chạy được lưu trong bảng schema_migrations.
+# Thêm migration mới: viết hàm nhận `conn` và gắn @migration(<số kế tiếp>, '<mô tả>'). Không sửa migration đã phát hành.
+from datetime import datetime
+from sqlalchemy import (Boolean, Column, Date, DateTime, ForeignKey, Index, Integer, MetaData, Numeric, String, Table, Text,
+                        UniqueConstraint, inspect, insert, select, text)
+from sqlalchemy.schema import CreateColumn
+from database import db
+import search
+
+MIGRATIONS = []
+
+schema_migrations = Table('schema_migrations', MetaData(),
+                          Column('version', Integer, primary_key=True),
+                          Column('name', String(200), nullable=False),
+                          Column('applied_at', DateTime, default=datetime.utcnow))
+
+def migration(version, name):
+    def wrap(fn):
+        MIGRATIONS.append((version, name, fn))
+        return fn
+    return wrap
+
+# ===== MIGRATIONS =====
+# Mỗi migration tự khai báo bảng / cột / chỉ mục như lúc nó được viết, không đọc từ models.py:
+# model đổi về sau thì migration cũ vẫn tạo đúng schema của phiên bản đó.
+def _add_column(conn, table, column):
+    if column.name not in {c['name'] for c in inspect(conn).get_columns(table)}:
+        conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {CreateColumn(column).compile(dialect=conn.dialect)}'))
+
+def _create_index(conn, name, table, columns, where=None):
+    conn.execute(text(f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})' + (f' WHERE {where}' if where else '')))
+
+@migration(1, 'base tables')
+def _base_tables(conn):
+    meta = MetaData()
+    Table('users', meta,
+          Column('id', Integer, primary_key=True),
+          Column('username', String(80), unique=True, nullable=False),
+          Column('email', String(120), unique=True, nullable=False),
+          Column('password_hash', String(256), nullable=False),
+          Column('role', String(20)),
+          Column('created_at', DateTime),
+          Column('is_active', Boolean))
+    Table('products', meta,
+          Column('id', Integer, primary_key=True),
+          Column('name', String(200), nullable=False),
+          Column('description', Text),
+          Column('sku', String(100), unique=True, nullable=False),
+          Column('category', String(100)),
+          Column('price', Numeric(10, 2), nullable=False),
+          Column('cost_price', Numeric(10, 2)),
+          Column('stock_quantity', Integer),
+          Column('min_stock', Integer),
+          Column('image_url', String(500)),
+          Column('created_at', DateTime),
+          Column('updated_at', DateTime))
+    Table('customers', meta,
+          Column('id', Integer, primary_key=True),
+          Column('name', String(200), nullable=False),
+          Column('email', String(120)),
+          Column('phone', String(50)),
+          Column('address', Text),
+          Column('customer_type', String(50)),
+          Column('created_at', DateTime))
+    Table('sales', meta,
+          Column('id', Integer, primary_key=True),
+          Column('sale_code', String(50), unique=True, nullable=False),
+          Column('customer_id', Integer, ForeignKey('customers.id')),
+          Column('user_id', Integer, ForeignKey('users.id'), nullable=False),
+          Column('total_amount', Numeric(10, 2), nullable=False),
+          Column('discount', Numeric(10, 2)),
+          Column('tax', Numeric(10, 2)),
+          Column('payment_method', String(50)),
+          Column('status', String(50)),
+          Column('sale_date', DateTime),
+          Column('notes', Text))
+    Table('sale_items', meta,
+          Column('id', Integer, primary_key=True),
+          Column('sale_id', Integer, ForeignKey('sales.id'), nullable=False),
+          Column('product_id', Integer, ForeignKey('products.id'), nullable=False),
+          Column('quantity', Integer, nullable=False),
+          Column('unit_price', Numeric(10, 2), nullable=False),
+          Column('total_price', Numeric(10, 2), nullable=False))
+    Table('inventory_logs', meta,
+          Column('id', Integer, primary_key=True),
+          Column('product_id', Integer, ForeignKey('products.id'), nullable=False),
+          Column('change_type', String(50)),
+          Column('quantity_change', Integer, nullable=False),
+          Column('previous_quantity', Integer, nullable=False),
+          Column('new_quantity', Integer, nullable=False),
+          Column('reason', Text),
+          Column('reference', String(100)),
+          Column('created_at', DateTime),
+          Column('user_id', Integer, ForeignKey('users.id'), nullable=False))
+    Table('daily_sales_summaries', meta,
+          Column('id', Integer, primary_key=True),
+          Column('day', Date, nullable=False),
+          Column('payment_method', String(50), nullable=False),
+          Column('revenue', Numeric(14, 2), nullable=False),
+          Column('transaction_count', Integer, nullable=False),
+          Column('discount', Numeric(14, 2), nullable=False),
+          Column('tax', Numeric(14, 2), nullable=False),
+          Column('updated_at', DateTime),
+          UniqueConstraint('day', 'payment_method', name='uq_daily_sales_summary'))
+    Table('sale_sequences', meta,
+          Column('day', Date, primary_key=True),
+          Column('last_value', Integer, nullable=False))
+    meta.create_all(conn, checkfirst=True)
+    _fill_sales_summary(conn)
+
+def _fill_sales_summary(conn):
+    # Dữ liệu bán hàng có từ trước bảng tổng hợp: gom một lượt các đơn 'completed' theo (ngày, phương thức)
+    if conn.execute(text('SELECT 1 FROM daily_sales_summaries LIMIT 1')).first(): return
+    conn.execute(text("INSERT INTO daily_sales_summaries (day, payment_method, revenue, transaction_count, discount, tax, updated_at) "
+                      "SELECT date(sale_date), COALESCE(payment_method, 'other'), SUM(total_amount), COUNT(id), "
+                      "COALESCE(SUM(discount), 0), COALESCE(SUM(tax), 0), CURRENT_TIMESTAMP FROM sales WHERE status = 'completed' "
+                      "GROUP BY date(sale_date), COALESCE(payment_method, 'other')"))
+
+# Cột đưa vào chỉ mục tìm kiếm SQLite lúc migration 2 được viết: (kind, bảng, các cột)
+SEARCH_FIELDS = [('product', 'products', ('name', 'sku')), ('customer', 'customers', ('name', 'phone', 'email')),
+                 ('sale', 'sales', ('sale_code',))]
+
+def _fill_search_index(conn):
+    for kind, table, fields in SEARCH_FIELDS:
+        conn.execute(text('DELETE FROM search_index WHERE kind = :kind'), {'kind': kind})
+        rows = conn.execution_options(yield_per=1000).execute(text(f'SELECT id, {", ".join(fields)} FROM {table}'))
+        for batch in rows.partitions():
+            conn.execute(text('INSERT INTO search_index (kind, ref_id, body) VALUES (:kind, :ref_id, :body)'),
+                         [{'kind': kind, 'ref_id': row[0], 'body': search.normalize(' '.join(str(v or '') for v in row[1:]))}
+                          for row in batch])
+
+@migration(2, 'search index')
+def _search_index(conn):
+    search.create_index(conn)
+    if conn.dialect.name == 'sqlite': _fill_search_index(conn)  # PostgreSQL: chỉ mục trigram đọc thẳng từ bảng
+
+@migration(3, 'secondary indexes')
+def _secondary_indexes(conn):
+    # Bảng tạo từ trước (db.create_all cũ) chưa có chỉ mục phụ
+    _create_index(conn, 'ix_products_name_id', 'products', 'name, id')
+    _create_index(conn, 'ix_products_category', 'products', 'category')
+    _create_index(conn, 'ix_products_low_stock', 'products', 'id', where='stock_quantity <= min_stock')  # đếm "sắp hết hàng"
+    _create_index(conn, 'ix_customers_name_id', 'customers', 'name, id')
+    _create_index(conn, 'ix_sales_sale_date_id', 'sales', 'sale_date, id')
+    _create_index(conn, 'ix_sales_status_sale_date', 'sales', 'status, sale_date')
+    _create_index(conn, 'ix_sales_customer_id_sale_date', 'sales', 'customer_id, sale_date')
+    _create_index(conn, 'ix_sales_user_id', 'sales', 'user_id')
+    if conn.dialect.name == 'postgresql':
+        # LIKE 'SALE-2024%' với collation khác C cần text_pattern_ops
+        _create_index(conn, 'ix_sales_sale_code_pattern', 'sales', 'sale_code text_pattern_ops')
+    _create_index(conn, 'ix_sale_items_sale_id', 'sale_items', 'sale_id')
+    _create_index(conn, 'ix_sale_items_product_id_sale_id', 'sale_items', 'product_id, sale_id')
+    _create_index(conn, 'ix_inventory_logs_product_id_created_at', 'inventory_logs', 'product_id, created_at')
+    _create_index(conn, 'ix_inventory_logs_created_at', 'inventory_logs', 'created_at')
+
+@migration(4, 'inventory log archive and stock snapshots')
+def _inventory_history(conn):
+    meta = MetaData()
+    # PostgreSQL: inventory_logs_archive là bảng phân vùng (PARTITION BY RANGE created_at), phân vùng tháng tạo khi lưu trữ
+    Table('inventory_logs_archive', meta,
+          Column('id', Integer, primary_key=True, autoincrement=False),
+          Column('created_at', DateTime, primary_key=True),
+          Column('product_id', Integer, nullable=False),
+          Column('change_type', String(50)),
+          Column('quantity_change', Integer, nullable=False),
+          Column('previous_quantity', Integer, nullable=False),
+          Column('new_quantity', Integer, nullable=False),
+          Column('reason', Text),
+          Column('reference', String(100)),
+          Column('user_id', Integer, nullable=False),
+          Index('ix_inventory_logs_archive_product_id_created_at', 'product_id', 'created_at'),
+          postgresql_partition_by='RANGE (created_at)')
+    Table('stock_snapshots', meta,
+          Column('taken_at', DateTime, primary_key=True),
+          Column('product_id', Integer, primary_key=True, autoincrement=False),
+          Column('stock_quantity', Integer, nullable=False))
+    meta.create_all(conn, checkfirst=True)
+
+@migration(5, 'customer lifetime metrics')
+def _customer_metrics(conn):
+    # Chỉ số tích luỹ, chỉ tính đơn 'completed'
+    _add_column(conn, 'customers', Column('order_count', Integer, nullable=False, server_default=text('0')))
+    _add_column(conn, 'customers', Column('total_spent', Numeric(14, 2), nullable=False, server_default=text('0')))
+    _add_column(conn, 'customers', Column('last_purchase_at', DateTime))
+    _create_index(conn, 'ix_customers_total_spent_id', 'customers', 'total_spent, id')
+    _create_index(conn, 'ix_customers_order_count_id', 'customers', 'order_count, id')
+    _create_index(conn, 'ix_customers_last_purchase_at_id', 'customers', 'last_purchase_at, id')
+    completed = "FROM sales s WHERE s.customer_id = customers.id AND s.status = 'completed'"
+    conn.execute(text(f'UPDATE customers SET order_count = (SELECT COUNT(s.id) {completed}), '
+                      f'total_spent = (SELECT COALESCE(SUM(s.total_amount), 0) {completed}), '
+                      f'last_purchase_at = (SELECT MAX(s.sale_date) {completed})'))
+
+@migration(6, 'product catalog change index')
+def _catalog_index(conn):
+    _create_index(conn, 'ix_products_updated_at', 'products', 'updated_at')
+
+@migration(7, 'sale change timestamp')
+def _sale_updated_at(conn):
+    _add_column(conn, 'sales', Column('updated_at', DateTime))
+    _create_index(conn, 'ix_sales_updated_at', 'sales', 'updated_at')
+
+@migration(8, 'daily summary item count')
+def _summary_item_count(conn):
+    _add_column(conn, 'daily_sales_summaries', Column('item_count', Integer, nullable=False, server_default=text('0')))
+    _fill_summary_item_count(conn)
+
+def _fill_summary_item_count(conn):
+    # Backfill: gom một lượt theo (ngày, phương thức) rồi cập nhật từng dòng tổng hợp
+    rows = conn.execute(text("SELECT date(s.sale_date), COALESCE(s.payment_method, 'other'), SUM(i.quantity) "
+                             "FROM sales s JOIN sale_items i ON i.sale_id = s.id WHERE s.status = 'completed' "
+                             "GROUP BY date(s.sale_date), COALESCE(s.payment_method, 'other')")).all()
+    if rows:
+        conn.execute(text('UPDATE daily_sales_summaries SET item_count = :items WHERE day = :day AND payment_method = :method'),
+                     [{'day': day, 'method': method, 'items': items or 0} for day, method, items in rows])
+
+@migration(9, 'search index backfill')
+def _search_index_backfill(conn):
+    # CSDL đã chạy migration 2 trước khi nó có bước backfill: bảng FTS vẫn rỗng
+    if conn.dialect.name != 'sqlite' or conn.execute(text('SELECT 1 FROM search_index LIMIT 1')).first(): return
+    _fill_search_index(conn)
+
+@migration(10, 'daily sales summary backfill')
+def _sales_summary_backfill(conn):
+    # CSDL đã chạy migration 1 trước khi nó có bước backfill: bảng tổng hợp vẫn rỗng
+    if conn.execute(text('SELECT 1 FROM daily_sales_summaries LIMIT 1')).first(): return
+    _fill_sales_summary(conn)
+    _fill_summary_item_count(conn)
+
+# ===== RUNNER =====
+def applied_versions(conn):
+    schema_migrations.create(conn, checkfirst=True)
+    return {v for v, in conn.execute(select(schema_migrations.c.version))}
+
+def upgrade(engine=None, target=None):
+    """Chạy các migration chưa áp dụng (mỗi cái một transaction). Trả về danh sách phiên bản vừa chạy."""
+    engine = engine or db.engine
+    done = []
+    for version, name, fn in sorted(MIGRATIONS, key=lambda m: m[0]):
+        if target is not None and version > target: break
+        with engine.begin() as conn:
+            if conn.dialect.name == 'postgresql':
+                # Nhiều tiến trình cùng khởi động: chỉ một tiến trình chạy migration tại một thời điểm
+                conn.execute(text('SELECT pg_advisory_xact_lock(7210815)'))
+            if version in applied_versions(conn): continue
+            fn(conn)
+            conn.execute(insert(schema_migrations).values(version=version, name=name, applied_at=datetime.utcnow()))
+        done.append(version)
+    return done
+
+def status(engine=None):
+    with (engine or db.engine).begin() as conn:
+        applied = applied_versions(conn)
+    return [(version, name, version in applied) for version, name, _ in sorted(MIGRATIONS, key=lambda m: m[0])]
+
+# ===== INDEX CHECK =====
+# Các mẫu truy vấn trong routes.py / reporting.py và chỉ mục (cột đứng đầu) phục vụ chúng
+EXPECTED_INDEXES = [
+    ('sales', ('sale_date',), 'dashboard recent_sales, filter_sales, phân trang (sale_date, id)'),
+    ('sales', ('status', 'sale_date'), 'reporting: status = completed AND sale_date trong kỳ'),
+    ('sales', ('customer_id',), 'customer_detail, top_customers'),
+    ('sales', ('sale_code',), "filter_sales: sale_code LIKE 'SALE-...%'"),
+    ('sales', ('updated_at',), 'http_cache: ETag / Last-Modified trang bán hàng'),
+    ('sale_items', ('sale_id',), 'sale_detail, cancel_sale, sales_stats'),
+    ('sale_items', ('product_id',), 'sales_by_category, top_products'),
+    ('inventory_logs', ('product_id', 'created_at'), 'lịch sử tồn kho theo sản phẩm'),
+    ('inventory_logs', ('created_at',), 'lịch sử tồn kho theo thời gian'),
+    ('inventory_logs_archive', ('product_id', 'created_at'), 'stock_as_of: phần log giữa snapshot và ngày cần tra'),
+    ('stock_snapshots', ('taken_at',), 'stock_as_of: snapshot gần nhất trước / sau một thời điểm'),
+    ('products', ('category',), 'products: lọc theo danh mục, DISTINCT category'),
+    ('products', ('name',), 'products: ORDER BY name'),
+    ('products', ('updated_at',), 'catalog: sản phẩm đổi kể từ lần làm mới trước'),
+    ('customers', ('name',), 'customers: phân trang (name, id)'),
+    ('customers', ('total_spent',), 'customers: sắp xếp theo tổng chi tiêu'),
+    ('customers', ('order_count',), 'customers: sắp xếp / lọc theo số đơn'),
+    ('customers', ('last_purchase_at',), 'customers: sắp xếp / lọc theo lần mua gần nhất'),
+    ('daily_sales_summaries', ('day',), 'dashboard: 7 ngày gần nhất'),
+]
+EXPECTED_NAMED = [('products', 'ix_products_low_stock', 'dashboard: stock_quantity <= min_stock')]
+
+def missing_indexes(engine=None):
+    """[(bảng, cột hoặc tên chỉ mục, mẫu truy vấn)] chưa có chỉ mục tương ứng."""
+    insp = inspect(engine or db.engine)
+    tables = set(insp.get_table_names())
+    covered, names = {}, {}
+    for table in {t for t, _, _ in EXPECTED_INDEXES + EXPECTED_NAMED} & tables:
+        keys = [tuple(i['column_names']) for i in insp.get_indexes(table) if None not in (i.get('column_names') or [None])]
+        keys += [tuple(u['column_names']) for u in insp.get_unique_constraints(table)]
+        keys.append(tuple(insp.get_pk_constraint(table).get('constrained_columns') or ()))
+        covered[table] = keys
+        names[table] = {i['name'] for i in insp.get_indexes(table)}
+    missing = [(t, ', '.join(cols), why) for t, cols, why in EXPECTED_INDEXES
+               if not any(k[:len(cols)] == cols for k in covered.get(t, []))]
+    missing += [(t, name, why) for t, name, why in EXPECTED_NAMED if name not in names.get(t, set())]
+    return missing
@@ -1,7 +1,8 @@
 from datetime import datetime
 from flask_login import UserMixin
 from database import db
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import check_password_hash
+import security
 
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
@@ -18,7 +19,7 @@ class User(UserMixin, db.Model):
     sales = db.relationship('Sale', backref='user', lazy=True)
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = security.hash_password(password)
     
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
@@ -41,6 +42,15 @@ class Product(db.Model):
     
     # Relationships
     sale_items = db.relationship('SaleItem', backref='product', lazy=True)
+    
+    __table_args__ = (
+        db.Index('ix_products_name_id', 'name', 'id'),
+        db.Index('ix_products_category', 'category'),
+        db.Index('ix_products_updated_at', 'updated_at'),
+        # Chỉ mục một phần cho đếm "sắp hết hàng" trên dashboard
+        db.Index('ix_products_low_stock', 'id', postgresql_where=db.text('stock_quantity <= min_stock'),
+                 sqlite_where=db.text('stock_quantity <= min_stock')),
+    )
 
 class Customer(db.Model):
     __tablename__ = 'customers'
@@ -52,9 +62,20 @@ class Customer(db.Model):
     address = db.Column(db.Text)
     customer_type = db.Column(db.String(50))  # retail, wholesale, corporate
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Chỉ số tích luỹ (chỉ tính đơn 'completed'), cập nhật trong customer_metrics.apply_sale
+    order_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    total_spent = db.Column(db.Numeric(14, 2), nullable=False, default=0, server_default='0')
+    last_purchase_at = db.Column(db.DateTime)
     
     # Relationships
     sales = db.relationship('Sale', backref='customer', lazy=True)
+    
+    __table_args__ = (
+        db.Index('ix_customers_name_id', 'name', 'id'),
+        db.Index('ix_customers_total_spent_id', 'total_spent', 'id'),
+        db.Index('ix_customers_order_count_id', 'order_count', 'id'),
+        db.Index('ix_customers_last_purchase_at_id', 'last_purchase_at', 'id'),
+    )
 
 class Sale(db.Model):
     __tablename__ = 'sales'
@@ -70,9 +91,20 @@ class Sale(db.Model):
     status = db.Column(db.String(50), default='completed')  # pending, completed, cancelled
     sale_date = db.Column(db.DateTime, default=datetime.utcnow)
     notes = db.Column(db.Text)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
     sale_items = db.relationship('SaleItem', backref='sale', lazy=True, cascade='all, delete-orphan')
+    
+    __table_args__ = (
+        db.Index('ix_sales_sale_date_id', 'sale_date', 'id'),
+        db.Index('ix_sales_status_sale_date', 'status', 'sale_date'),
+        db.Index('ix_sales_customer_id_sale_date', 'customer_id', 'sale_date'),
+        db.Index('ix_sales_user_id', 'user_id'),
+        db.Index('ix_sales_updated_at', 'updated_at'),
+        # LIKE 'SALE-2024%' trên PostgreSQL với collation khác C cần text_pattern_ops
+        db.Index('ix_sales_sale_code_pattern', 'sale_code', postgresql_ops={'sale_code': 'text_pattern_ops'}).ddl_if(dialect='postgresql'),
+    )
 
 class SaleItem(db.Model):
     __tablename__ = 'sale_items'
@@ -83,6 +115,11 @@ class SaleItem(db.Model):
     quantity = db.Column(db.Integer, nullable=False)
     unit_price = db.Column(db.Numeric(10, 2), nullable=False)
     total_price = db.Column(db.Numeric(10, 2), nullable=False)
+    
+    __table_args__ = (
+        db.Index('ix_sale_items_sale_id', 'sale_id'),
+        db.Index('ix_sale_items_product_id_sale_id', 'product_id', 'sale_id'),
+    )
 
 class InventoryLog(db.Model):
     __tablename__ = 'inventory_logs'
@@ -96,4 +133,59 @@ class InventoryLog(db.Model):
     reason = db.Column(db.Text)
     reference = db.Column(db.String(100))  # sale_id, purchase_id, etc.
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
\ No newline at end of file
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    
+    __table_args__ = (
+        db.Index('ix_inventory_logs_product_id_created_at', 'product_id', 'created_at'),
+        db.Index('ix_inventory_logs_created_at', 'created_at'),
+    )
+
+class DailySalesSummary(db.Model):
+    __tablename__ = 'daily_sales_summaries'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    payment_method = db.Column(db.String(50), nullable=False, default='other')
+    revenue = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    transaction_count = db.Column(db.Integer, nullable=False, default=0)
+    discount = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    tax = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    item_count = db.Column(db.Integer, nullable=False, default=0)  # tổng số lượng sản phẩm bán ra
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (db.UniqueConstraint('day', 'payment_method', name='uq_daily_sales_summary'),)
+
+class SaleSequence(db.Model):
+    __tablename__ = 'sale_sequences'
+    
+    day = db.Column(db.Date, primary_key=True)
+    last_value = db.Column(db.Integer, nullable=False, default=0)
+
+# Dòng inventory_logs đã cũ, chuyển ra khỏi bảng nóng bằng lệnh archive-inventory-logs.
+# PostgreSQL: bảng phân vùng theo tháng (created_at); khoá chính phải chứa cột phân vùng.
+class InventoryLogArchive(db.Model):
+    __tablename__ = 'inventory_logs_archive'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    created_at = db.Column(db.DateTime, primary_key=True)
+    product_id = db.Column(db.Integer, nullable=False)
+    change_type = db.Column(db.String(50))
+    quantity_change = db.Column(db.Integer, nullable=False)
+    previous_quantity = db.Column(db.Integer, nullable=False)
+    new_quantity = db.Column(db.Integer, nullable=False)
+    reason = db.Column(db.Text)
+    reference = db.Column(db.String(100))
+    user_id = db.Column(db.Integer, nullable=False)
+    
+    __table_args__ = (
+        db.Index('ix_inventory_logs_archive_product_id_created_at', 'product_id', 'created_at'),
+        {'postgresql_partition_by': 'RANGE (created_at)'},
+    )
+
+# Tồn kho của mọi sản phẩm tại một thời điểm; tồn kho ngày X = snapshot gần nhất + phần log sau đó.
+class StockSnapshot(db.Model):
+    __tablename__ = 'stock_snapshots'
+    
+    taken_at = db.Column(db.DateTime, primary_key=True)
+    product_id = db.Column(db.Integer, primary_key=True)
+    stock_quantity = db.Column(db.Integer, nullable=False)
@@ -0,0 +1,45 @@
+# pagination.py
+# Phân trang theo khoá (keyset): WHERE (a, b) < (:a, :b) ORDER BY a, b LIMIT n — chi phí mỗi trang không đổi.
+import base64, json
+from collections import namedtuple
+from datetime import date, datetime
+from decimal import Decimal
+from sqlalchemy import literal, tuple_
+
+Page = namedtuple('Page', 'items next_cursor has_more')
+
+DEFAULT_LIMIT, MAX_LIMIT = 50, 200
+
+def encode_cursor(values):
+    raw = json.dumps([v.isoformat() if isinstance(v, (date, datetime)) else str(v) if isinstance(v, Decimal) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(token, columns):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except (ValueError, TypeError):
+        raise ValueError('Con trỏ phân trang không hợp lệ')
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise ValueError('Con trỏ phân trang không hợp lệ')
+    out = []
+    for col, v in zip(columns, values):
+        kind = col.type.python_type
+        try: out.append(kind.fromisoformat(v) if kind in (date, datetime) else kind(v))
+        except (TypeError, ValueError, ArithmeticError):  # InvalidOperation của Decimal là ArithmeticError
+            raise ValueError('Con trỏ phân trang không hợp lệ')
+    return out
+
+def parse_limit(value, default=DEFAULT_LIMIT):
+    try: return max(1, min(int(value), MAX_LIMIT))
+    except (TypeError, ValueError): return default
+
+def keyset_page(query, columns, cursor=None, limit=DEFAULT_LIMIT, desc=False):
+    """Lấy một trang; `columns` phải là khoá duy nhất (cột cuối thường là id)."""
+    if cursor:
+        key = tuple_(*columns)
+        bound = tuple_(*[literal(v, c.type) for c, v in zip(columns, decode_cursor(cursor, columns))])
+        query = query.filter(key < bound if desc else key > bound)
+    rows = query.order_by(*[c.desc() if desc else c.asc() for c in columns]).limit(limit + 1).all()
+    items, has_more = rows[:limit], len(rows) > limit
+    next_cursor = encode_cursor([getattr(items[-1], c.key) for c in columns]) if has_more else None
+    return Page(items, next_cursor, has_more)
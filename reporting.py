@@ -0,0 +1,129 @@
+# reporting.py
+# Báo cáo tổng hợp bằng GROUP BY + cache theo (loại báo cáo, kỳ báo cáo).
+import threading, time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from flask import current_app
+from sqlalchemy import func
+from database import db
+from models import Product, Sale, SaleItem, Customer, DailySalesSummary
+import today_stats
+
+PERIODS = ('today', 'yesterday', 'week', 'month', 'quarter', 'year', 'custom')
+
+def period_range(period, start_date=None, end_date=None, today=None):
+    """Trả về (start, end) dạng date, cả hai đầu đều tính."""
+    today = today or today_stats.today()
+    if period == 'today': return today, today
+    if period == 'yesterday': return today - timedelta(days=1), today - timedelta(days=1)
+    if period == 'week': return today - timedelta(days=today.weekday()), today
+    if period == 'month': return today.replace(day=1), today
+    if period == 'quarter': return date(today.year, 3 * ((today.month - 1) // 3) + 1, 1), today
+    if period == 'year': return date(today.year, 1, 1), today
+    if period == 'custom':
+        start = datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else date(today.year, 1, 1)
+        end = datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else today
+        return start, end
+    raise ValueError(f'Kỳ báo cáo không hợp lệ: {period}')
+
+def _bounds(start, end):
+    return datetime.combine(start, datetime.min.time()), datetime.combine(end + timedelta(days=1), datetime.min.time())
+
+def _month(col):
+    if db.engine.dialect.name == 'postgresql': return func.to_char(col, 'YYYY-MM')
+    return func.strftime('%Y-%m', col)
+
+def _completed_sales(start, end):
+    lo, hi = _bounds(start, end)
+    return [Sale.status == 'completed', Sale.sale_date >= lo, Sale.sale_date < hi]
+
+# ===== REPORTS =====
+def monthly_sales(start, end):
+    month = _month(DailySalesSummary.day)
+    rows = db.session.query(month, func.sum(DailySalesSummary.revenue), func.sum(DailySalesSummary.transaction_count)) \
+        .filter(DailySalesSummary.day.between(start, end)).group_by(month).order_by(month.desc()).all()
+    return [{'month': f'Tháng {int(m[5:])}/{m[:4]}', 'key': m, 'total_sales': float(t or 0), 'transaction_count': int(c or 0)}
+            for m, t, c in rows]
+
+def sales_by_category(start, end):
+    total_sales, total_quantity = func.sum(SaleItem.total_price), func.sum(SaleItem.quantity)
+    rows = db.session.query(Product.category, total_sales, total_quantity) \
+        .join(SaleItem, SaleItem.product_id == Product.id).join(Sale, Sale.id == SaleItem.sale_id) \
+        .filter(*_completed_sales(start, end)).group_by(Product.category).order_by(total_sales.desc()).all()
+    return [{'category': c, 'total_sales': float(t or 0), 'total_quantity': int(q or 0)} for c, t, q in rows]
+
+def top_products(start, end, limit=10):
+    total_sold, total_revenue = func.sum(SaleItem.quantity), func.sum(SaleItem.total_price)
+    rows = db.session.query(Product.id, Product.name, Product.sku, total_sold, total_revenue) \
+        .join(SaleItem, SaleItem.product_id == Product.id).join(Sale, Sale.id == SaleItem.sale_id) \
+        .filter(*_completed_sales(start, end)).group_by(Product.id, Product.name, Product.sku) \
+        .order_by(total_revenue.desc()).limit(limit).all()
+    return [{'id': i, 'name': n, 'sku': s, 'total_sold': int(q or 0), 'total_revenue': float(r or 0)} for i, n, s, q, r in rows]
+
+def top_customers(start, end, limit=10):
+    total_spent, order_count = func.sum(Sale.total_amount), func.count(Sale.id)
+    rows = db.session.query(Customer.id, Customer.name, order_count, total_spent) \
+        .join(Sale, Sale.customer_id == Customer.id).filter(*_completed_sales(start, end)) \
+        .group_by(Customer.id, Customer.name).order_by(total_spent.desc()).limit(limit).all()
+    return [{'id': i, 'name': n, 'order_count': int(c), 'total_spent': float(t or 0)} for i, n, c, t in rows]
+
+def inventory_by_category():
+    rows = db.session.query(Product.category, func.count(Product.id), func.coalesce(func.sum(Product.stock_quantity), 0),
+                            func.coalesce(func.sum(Product.stock_quantity * Product.price), 0),
+                            func.sum(db.case((Product.stock_quantity <= Product.min_stock, 1), else_=0))) \
+        .group_by(Product.category).order_by(Product.category).all()
+    return [{'category': c, 'product_count': n, 'stock_quantity': int(q), 'stock_value': float(v), 'low_stock_count': int(l or 0)}
+            for c, n, q, v, l in rows]
+
+REPORTS = {
+    'sales_summary': lambda s, e: {'monthly_sales': monthly_sales(s, e), 'sales_by_category': sales_by_category(s, e)},
+    'product_performance': lambda s, e: {'top_products': top_products(s, e), 'sales_by_category': sales_by_category(s, e)},
+    'customer_analysis': lambda s, e: {'top_customers': top_customers(s, e)},
+    'inventory_report': lambda s, e: {'inventory': inventory_by_category()},
+}
+
+# ===== CACHE =====
+class ReportCache:
+    """Cache trong tiến trình, hết hạn theo TTL và bị xoá khi có đơn hàng rơi vào khoảng thời gian của báo cáo.
+    Giới hạn max_size mục (LRU) vì kỳ tuỳ chọn tạo ra số khoá không giới hạn."""
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, start, end, value)
+
+    def get_or_compute(self, key, start, end, compute, ttl):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                return entry[3]
+        value = compute()
+        with self._lock:
+            for old in [k for k, e in self._entries.items() if e[0] <= now]: del self._entries[old]
+            self._entries[key] = (now + ttl, start, end, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size: self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, day=None, report=None):
+        with self._lock:
+            for key, (_, start, end, _) in list(self._entries.items()):
+                if (report is None or key[0] == report) and (day is None or start <= day <= end):
+                    del self._entries[key]
+
+    def clear(self):
+        with self._lock: self._entries.clear()
+
+cache = ReportCache()
+
+def get_report(report_type, period='month', start_date=None, end_date=None):
+    if report_type not in REPORTS: raise KeyError(report_type)
+    start, end = period_range(period, start_date, end_date)
+    ttl = current_app.config.get('REPORT_CACHE_TTL', 300)
+    value = cache.get_or_compute((report_type, start, end), start, end, lambda: REPORTS[report_type](start, end), ttl)
+    return dict(value, report_type=report_type, period=period, start_date=start.isoformat(), end_date=end.isoformat())
+
+def invalidate_sale(sale):
+    """Gọi sau khi ghi SaleItem / đổi trạng thái đơn hàng."""
+    cache.invalidate(day=(sale.sale_date or datetime.utcnow()).date())
@@ -1,61 +1,74 @@
-from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for
+from flask import Blueprint, Response, render_template, request, jsonify, flash, redirect, url_for, send_file, abort, g
 from flask_login import login_required, current_user
 from models import db, Product, Sale, Customer, SaleItem, InventoryLog
 from datetime import datetime, timedelta
-import random, string, json
-from flask_socketio import SocketIO
+from sqlalchemy import func
+from sqlalchemy.orm import selectinload
+from pagination import keyset_page, parse_limit, decode_cursor
+import os, random, string, json
+import sales_summary, customer_metrics, reporting, exports
+import search as fulltext
+import instrumentation, events, today_stats, jobs, catalog, http_cache
+from checkout import checkout, CheckoutError
+import bulk_inventory, inventory_history
+from bulk_inventory import BulkError
+from sale_codes import is_code_prefix
 
-main = Blueprint('main', __name__)
-socketio = SocketIO()
+main_bp = Blueprint('main', __name__)
+POS_PRODUCT_LIMIT = 24
 
 # ===== DASHBOARD =====
-@main.route('/')
+@main_bp.route('/')
 @login_required
 def dashboard():
-    today = datetime.now().date()
-    today_sales = Sale.query.filter(Sale.sale_date.between(
-        datetime.combine(today, datetime.min.time()),
-        datetime.combine(today, datetime.max.time())
-    )).all()
-    total_sales = sum(sale.total_amount for sale in today_sales)
+    today = today_stats.today()
+    totals = sales_summary.daily_totals(today - timedelta(days=6), today)
+    current = today_stats.get_today()
+    total_sales, total_transactions, low_stock_count = current['revenue'], current['transactions'], current['low_stock']
     recent_sales = Sale.query.order_by(Sale.sale_date.desc()).limit(10).all()
-    low_stock_count = Product.query.filter(Product.stock_quantity <= Product.min_stock).count()
     
-    last_7_days = [(today - timedelta(days=i)).strftime('%a') for i in range(6, -1, -1)]
-    sales_data = [sum(s.total_amount for s in Sale.query.filter(
-                    Sale.sale_date.between(
-                        datetime.combine(today - timedelta(days=i), datetime.min.time()),
-                        datetime.combine(today - timedelta(days=i), datetime.max.time())
-                    )).all()) for i in range(6, -1, -1)]
+    days = [today - timedelta(days=i) for i in range(6, -1, -1)]
+    last_7_days = [d.strftime('%a') for d in days]
+    sales_data = [totals.get(d, (0, 0))[0] for d in days]
     
-    return render_template('dashboard.html', total_sales=total_sales, total_transactions=len(today_sales),
-                           low_stock_count=low_stock_count, recent_sales=recent_sales,
+    return render_template('dashboard.html', total_sales=total_sales, total_transactions=total_transactions,
+                           low_stock_count=low_stock_count, today_day=current['day'], recent_sales=recent_sales,
                            last_7_days=last_7_days, sales_data=sales_data)
 
 # ===== PRODUCTS =====
-@main.route('/products')
+@main_bp.route('/products')
 @login_required
+@http_cache.conditional(http_cache.products_version)
 def products():
     search, category = request.args.get('search', ''), request.args.get('category', '')
     query = Product.query
-    if search: query = query.filter(Product.name.ilike(f'%{search}%'))
+    criterion = fulltext.matches('product', search)
+    if criterion is not None: query = query.filter(criterion)
     if category: query = query.filter(Product.category == category)
-    products = query.order_by(Product.name).all()
-    categories = [c[0] for c in db.session.query(Product.category).distinct() if c[0]]
-    return render_template('products.html', products=products, categories=categories, search=search, category=category)
+    products = http_cache.Deferred(query.order_by(Product.name).all)
+    return render_template('products.html', products=products, categories=catalog.categories(), search=search, category=category)
 
 def save_product(form, product=None):
     sku = form.get('sku') or 'SKU-' + ''.join(random.choices(string.digits, k=8))
     if not product: product = Product()
+    was = (product.stock_quantity, product.min_stock)  # sản phẩm mới: (None, None) -> chưa tính là sắp hết hàng
+    prev = product.stock_quantity or 0
     product.name, product.description, product.category = form.get('name'), form.get('description'), form.get('category')
     product.sku, product.price, product.cost_price = sku, float(form.get('price',0)), float(form.get('cost_price',0))
     product.stock_quantity, product.min_stock, product.image_url = int(form.get('stock_quantity',0)), int(form.get('min_stock',10)), form.get('image_url')
     product.updated_at = datetime.utcnow()
     db.session.add(product)
+    if product.stock_quantity != prev:
+        # Ghi log cả khi sửa tồn kho qua form sản phẩm để stock_as_of cộng dồn đúng
+        db.session.flush()
+        db.session.add(InventoryLog(product_id=product.id, change_type='adjustment', quantity_change=product.stock_quantity-prev,
+                                    previous_quantity=prev, new_quantity=product.stock_quantity, reason='Cập nhật sản phẩm', user_id=current_user.id))
     db.session.commit()
+    reporting.cache.invalidate(report='inventory_report'); catalog.invalidate()
+    today_stats.record(low_stock=today_stats.low_stock_change([(was[0], product.stock_quantity, was[1], product.min_stock)]))
     return product
 
-@main.route('/product/add', methods=['GET','POST'])
+@main_bp.route('/product/add', methods=['GET','POST'])
 @login_required
 def add_product(): 
     if request.method=='POST': 
@@ -64,7 +77,7 @@ def add_product():
         return redirect(url_for('main.products'))
     return render_template('add_product.html')
 
-@main.route('/product/edit/<int:id>', methods=['GET','POST'])
+@main_bp.route('/product/edit/<int:id>', methods=['GET','POST'])
 @login_required
 def edit_product(id):
     product = Product.query.get_or_404(id)
@@ -74,82 +87,216 @@ def edit_product(id):
         return redirect(url_for('main.products'))
     return render_template('edit_product.html', product=product)
 
-@main.route('/product/delete/<int:id>')
+@main_bp.route('/product/delete/<int:id>')
 @login_required
 def delete_product(id):
-    db.session.delete(Product.query.get_or_404(id))
-    db.session.commit()
+    product = Product.query.get_or_404(id)
+    low_stock = today_stats.low_stock_change([(product.stock_quantity, None, product.min_stock, None)])
+    db.session.delete(product)
+    db.session.commit(); catalog.invalidate(); today_stats.record(low_stock=low_stock)
     flash('Sản phẩm đã xóa!', 'success')
     return redirect(url_for('main.products'))
 
 # ===== SALES =====
 def filter_sales(search='', date_from='', date_to=''):
     query = Sale.query
-    if search: query = query.filter(Sale.sale_code.ilike(f'%{search}%'))
+    if search:
+        criterion = Sale.sale_code.startswith(search.strip().upper()) if is_code_prefix(search) else fulltext.matches('sale', search)
+        if criterion is not None: query = query.filter(criterion)
     if date_from: query = query.filter(Sale.sale_date >= datetime.strptime(date_from,'%Y-%m-%d'))
     if date_to: query = query.filter(Sale.sale_date <= datetime.strptime(date_to,'%Y-%m-%d'))
-    return query.order_by(Sale.sale_date.desc()).all()
+    return query
+
+SALES_KEY = [Sale.sale_date, Sale.id]
+
+def sales_page(args):
+    query = filter_sales(args.get('search',''), args.get('date_from',''), args.get('date_to','')) \
+        .options(selectinload(Sale.customer), selectinload(Sale.user))
+    return keyset_page(query, SALES_KEY, args.get('cursor'), parse_limit(args.get('limit')), desc=True)
+
+def sales_stats(query=None):
+    """Thống kê đơn 'completed': không lọc thì đọc bảng tổng hợp theo ngày, có lọc mới tính trên bảng sales."""
+    if query is None:
+        revenue, count, items = sales_summary.totals()
+        return {'count': count, 'total_revenue': revenue, 'total_items': items}
+    query = query.filter(Sale.status == 'completed')
+    count, revenue = query.with_entities(func.count(Sale.id), func.coalesce(func.sum(Sale.total_amount), 0)).one()
+    items = db.session.query(func.coalesce(func.sum(SaleItem.quantity), 0)) \
+        .filter(SaleItem.sale_id.in_(query.with_entities(Sale.id))).scalar()
+    return {'count': count, 'total_revenue': float(revenue), 'total_items': int(items)}
+
+def sale_dict(s):
+    return {'id':s.id,'sale_code':s.sale_code,'customer':s.customer.name if s.customer else 'Khách lẻ',
+            'user':s.user.username if s.user else None,'date':s.sale_date.strftime('%d/%m/%Y %H:%M'),
+            'total_amount':float(s.total_amount),'payment_method':s.payment_method,'status':s.status}
 
-@main.route('/sales')
+@main_bp.route('/sales')
 @login_required
+@http_cache.conditional(http_cache.sales_version)
 def sales():
-    return render_template('sales.html', sales=filter_sales(request.args.get('search',''), request.args.get('date_from',''), request.args.get('date_to','')),
-                           search=request.args.get('search',''), date_from=request.args.get('date_from',''), date_to=request.args.get('date_to',''))
+    search, date_from, date_to = request.args.get('search',''), request.args.get('date_from',''), request.args.get('date_to','')
+    try:
+        query = filter_sales(search, date_from, date_to)
+        if request.args.get('cursor'): decode_cursor(request.args['cursor'], SALES_KEY)
+    except ValueError: return redirect(url_for('main.sales', search=search, date_from=date_from, date_to=date_to))
+    # Truy vấn chỉ chạy khi fragment tương ứng chưa có trong cache
+    page = http_cache.Deferred(lambda: sales_page(request.args))
+    return render_template('sales.html', sales=http_cache.Deferred(lambda: page.items), next_cursor=http_cache.Deferred(lambda: page.next_cursor),
+                           stats=http_cache.Deferred(lambda: sales_stats(query if search or date_from or date_to else None)), search=search, date_from=date_from, date_to=date_to)
+
+@main_bp.route('/api/sales')
+@login_required
+def api_sales():
+    try: page = sales_page(request.args)
+    except ValueError as e: return jsonify({'success':False,'message':str(e)}),400
+    return jsonify({'success':True,'items':[sale_dict(s) for s in page.items],'next_cursor':page.next_cursor,'has_more':page.has_more})
+
+@main_bp.route('/api/sales/today')
+@login_required
+def sales_today():
+    # Dự phòng cho client mất kết nối Socket.IO: trả 304 khi số liệu chưa đổi
+    data = today_stats.get_today()
+    response = jsonify(dict(data, success=True, total_sales=data['revenue'], total_transactions=data['transactions'],
+                            low_stock_count=data['low_stock']))
+    response.set_etag(today_stats.etag(data))
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
+@main_bp.route('/sales/history')
+@login_required
+def sales_history():
+    period = request.args.get('period','month')
+    try: start, end = reporting.period_range(period, request.args.get('start_date'), request.args.get('end_date'))
+    except ValueError: return redirect(url_for('main.sales_history'))
+    query = Sale.query.filter(Sale.sale_date >= datetime.combine(start, datetime.min.time()),
+                              Sale.sale_date < datetime.combine(end + timedelta(days=1), datetime.min.time())) \
+        .options(selectinload(Sale.customer), selectinload(Sale.user), selectinload(Sale.sale_items).selectinload(SaleItem.product))
+    try: page = keyset_page(query, SALES_KEY, request.args.get('cursor'), parse_limit(request.args.get('limit')), desc=True)
+    except ValueError: return redirect(url_for('main.sales_history', period=period, start_date=request.args.get('start_date'), end_date=request.args.get('end_date')))
+    # Số liệu cả kỳ (thẻ tổng, biểu đồ, thanh toán, top sản phẩm) đọc từ bảng tổng hợp / GROUP BY, không từ danh sách
+    revenue, count, items = sales_summary.totals(start, end)
+    daily = sorted(sales_summary.daily_totals(start, end).items())
+    return render_template('sales_history.html', sales=page.items, next_cursor=page.next_cursor, period=period, start_date=start, end_date=end,
+                           total_sales=revenue, total_transactions=count, total_items=items, average_sale=revenue/count if count else 0,
+                           daily=[(d.isoformat(), r) for d, (r, _) in daily], payment_stats=sales_summary.payment_totals(start, end),
+                           top_products=reporting.top_products(start, end, limit=5))
 
-@main.route('/sale/new', methods=['GET','POST'])
+@main_bp.route('/sale/new', methods=['GET','POST'])
 @login_required
 def new_sale():
     if request.method=='POST':
-        sale_code = 'SALE-'+datetime.now().strftime('%Y%m%d')+'-'+''.join(random.choices(string.digits,k=4))
-        sale = Sale(sale_code=sale_code, customer_id=request.form.get('customer_id'), user_id=current_user.id,
-                    total_amount=float(request.form.get('total_amount',0)), discount=float(request.form.get('discount',0)),
-                    tax=float(request.form.get('tax',0)), payment_method=request.form.get('payment_method'), notes=request.form.get('notes'))
-        db.session.add(sale); db.session.flush()
-        for i in json.loads(request.form.get('items','[]')):
-            product = Product.query.get(i['product_id'])
-            if product:
-                qty, price = int(i['quantity']), float(i['unit_price'])
-                product.stock_quantity -= qty
-                db.session.add(SaleItem(sale_id=sale.id, product_id=product.id, quantity=qty, unit_price=price, total_price=qty*price))
-                db.session.add(InventoryLog(product_id=product.id, change_type='stock_out', quantity_change=-qty,
-                                            previous_quantity=product.stock_quantity+qty, new_quantity=product.stock_quantity,
-                                            reason=f'Sale #{sale_code}', reference=str(sale.id), user_id=current_user.id))
-        db.session.commit()
+        f=request.form
+        try:
+            sale = checkout(current_user, json.loads(f.get('items') or '[]'), customer_id=int(f['customer_id']) if f.get('customer_id') else None,
+                            discount=f.get('discount'), tax=f.get('tax'), payment_method=f.get('payment_method'), notes=f.get('notes'))
+        except (CheckoutError, ValueError) as e:
+            db.session.rollback(); flash(str(e) if isinstance(e, CheckoutError) else 'Dữ liệu đơn hàng không hợp lệ', 'danger')
+            return redirect(url_for('main.new_sale'))
+        reporting.invalidate_sale(sale)
+        events.publish_sale({'sale_code':sale.sale_code,'status':sale.status,'total_amount':float(sale.total_amount),'user':current_user.username})
         flash('Đơn hàng đã tạo!', 'success'); return redirect(url_for('main.sale_detail', id=sale.id))
-    return render_template('new_sale.html', products=Product.query.filter(Product.stock_quantity>0).all(), customers=Customer.query.all())
+    return render_template('new_sale.html', customers=catalog.customers(), products=catalog.pos_products(POS_PRODUCT_LIMIT))
 
-@main.route('/sale/<int:id>')
+@main_bp.route('/api/catalog')
 @login_required
-def sale_detail(id): return render_template('sale_detail.html', sale=Sale.query.get_or_404(id))
+def api_catalog():
+    # Catalog gọn cho POS: ?since=<version> chỉ trả sản phẩm đổi / bị xoá sau version đó; 304 khi client đã có bản mới nhất
+    data = catalog.changes(request.args.get('since'))
+    response = jsonify(dict(data, success=True))
+    response.set_etag(data['version'])
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
+@main_bp.route('/api/products/search')
+@login_required
+def search_products():
+    products = fulltext.typeahead(request.args.get('q',''), parse_limit(request.args.get('limit'), 10), request.args.get('in_stock','1')!='0')
+    return jsonify({'success':True,'items':[{'id':p.id,'name':p.name,'sku':p.sku,'price':float(p.price),'stock_quantity':p.stock_quantity,
+                                            'min_stock':p.min_stock,'image_url':p.image_url} for p in products]})
+
+@main_bp.route('/sale/<int:id>')
+@login_required
+@http_cache.conditional(http_cache.sale_version)
+def sale_detail(id): return render_template('sale_detail.html', sale=g.sale)
 
 # ===== CUSTOMERS =====
-@main.route('/customers')
+def filter_customers(args):
+    query = Customer.query
+    criterion = fulltext.matches('customer', args.get('search',''))
+    if criterion is not None: query = query.filter(criterion)
+    try:
+        if args.get('min_orders'): query = query.filter(Customer.order_count >= int(args['min_orders']))
+        if args.get('min_spent'): query = query.filter(Customer.total_spent >= float(args['min_spent']))
+        if args.get('inactive_days'):
+            query = query.filter(Customer.last_purchase_at < datetime.utcnow() - timedelta(days=int(args['inactive_days'])))
+    except ValueError: raise ValueError('Bộ lọc không hợp lệ')
+    return query
+
+def customers_page(args):
+    columns, desc = customer_metrics.SORTS.get(args.get('sort'), customer_metrics.SORTS['name'])
+    query = filter_customers(args)
+    if columns[0] is Customer.last_purchase_at: query = query.filter(Customer.last_purchase_at.isnot(None))
+    return keyset_page(query, list(columns), args.get('cursor'), parse_limit(args.get('limit')), desc=desc)
+
+def customer_stats(query):
+    count, loyal, revenue = query.with_entities(func.count(Customer.id), func.coalesce(func.sum(db.case((Customer.order_count>=5, 1), else_=0)), 0),
+                                                func.coalesce(func.sum(Customer.total_spent), 0)).one()
+    return {'count': count, 'loyal': int(loyal), 'total_spent': float(revenue)}
+
+@main_bp.route('/customers')
 @login_required
 def customers(): 
-    search=request.args.get('search','')
-    query=Customer.query; 
-    if search: query=query.filter(Customer.name.ilike(f'%{search}%'))
-    return render_template('customers.html', customers=query.order_by(Customer.name).all(), search=search)
+    filters={k: request.args.get(k,'') for k in ('search','sort','min_orders','min_spent','inactive_days')}
+    try: page=customers_page(request.args); stats=customer_stats(filter_customers(request.args))
+    except ValueError: return redirect(url_for('main.customers', search=filters['search']))
+    top_customers=Customer.query.filter(Customer.order_count>0).order_by(Customer.total_spent.desc(), Customer.id.desc()).limit(5).all()
+    return render_template('customers.html', customers=page.items, next_cursor=page.next_cursor, stats=stats, top_customers=top_customers,
+                           filters=filters, **filters)
+
+@main_bp.route('/api/customers')
+@login_required
+def api_customers():
+    try: page=customers_page(request.args)
+    except ValueError as e: return jsonify({'success':False,'message':str(e)}),400
+    return jsonify({'success':True,'next_cursor':page.next_cursor,'has_more':page.has_more,
+                    'items':[{'id':c.id,'name':c.name,'phone':c.phone,'email':c.email,'customer_type':c.customer_type,
+                              'order_count':c.order_count,'total_spent':float(c.total_spent or 0),
+                              'last_purchase_at':c.last_purchase_at.isoformat() if c.last_purchase_at else None} for c in page.items]})
+
+@main_bp.route('/customer/add', methods=['GET','POST'])
+@login_required
+def add_customer():
+    if request.method=='POST':
+        f=request.form
+        db.session.add(Customer(name=f.get('name'), email=f.get('email'), phone=f.get('phone'), address=f.get('address'),
+                                customer_type=f.get('customer_type') or 'retail'))
+        db.session.commit(); catalog.invalidate()
+        flash('Khách hàng đã được thêm!', 'success')
+        return redirect(url_for('main.customers'))
+    return render_template('add_customer.html')
 
-@main.route('/customer/<int:id>')
+@main_bp.route('/customer/<int:id>')
 @login_required
 def customer_detail(id):
     c=Customer.query.get_or_404(id)
-    total=sum(s.total_amount for s in c.sales)
-    avg=total/len(c.sales) if c.sales else 0
-    return render_template('customer_detail.html', customer=c, total_spent=total, avg_order_value=avg,
-                           recent_sales=c.sales.order_by(Sale.sale_date.desc()).limit(10).all())
+    avg=c.total_spent/c.order_count if c.order_count else 0
+    recent_sales=Sale.query.filter_by(customer_id=c.id).order_by(Sale.sale_date.desc(), Sale.id.desc()).limit(10).all()
+    return render_template('customer_detail.html', customer=c, total_spent=c.total_spent, avg_order_value=avg, recent_sales=recent_sales)
 
 # ===== INVENTORY & SALE ACTIONS =====
+@main_bp.route('/inventory')
+@login_required
+@http_cache.conditional(http_cache.inventory_version)
+def inventory():
+    since = datetime.utcnow() - timedelta(days=30)
+    sold_last_month = http_cache.Deferred(lambda: dict(db.session.query(SaleItem.product_id, func.sum(SaleItem.quantity)).join(Sale, Sale.id==SaleItem.sale_id)
+                           .filter(Sale.sale_date >= since, Sale.status != 'cancelled').group_by(SaleItem.product_id).all()))
+    return render_template('inventory.html', products=http_cache.Deferred(Product.query.order_by(Product.name).all), sold_last_month=sold_last_month)
+
 def emit_inventory(product, change, reason):
-    socketio.emit('inventory_update', {'product_id':product.id,'product_name':product.name,'sku':product.sku,
-                                       'change':change,'new_quantity':product.stock_quantity,
-                                       'previous_quantity':product.stock_quantity-change,'reason':reason,'user':current_user.username})
-    if product.stock_quantity <= product.min_stock:
-        socketio.emit('stock_update', {'type':'low_stock','product_id':product.id,'product_name':product.name,
-                                       'quantity':product.stock_quantity,'min_stock':product.min_stock})
+    events.publish_inventory(product, change, reason, current_user)
 
-@main.route('/api/inventory/adjust', methods=['POST'])
+@main_bp.route('/api/inventory/adjust', methods=['POST'])
 @login_required
 def adjust_inventory():
     d=request.json; p=Product.query.get_or_404(d['product_id']); prev=p.stock_quantity
@@ -158,83 +305,162 @@ def adjust_inventory():
     p.stock_quantity=new_qty
     db.session.add(InventoryLog(product_id=p.id, change_type=d['type'], quantity_change=new_qty-prev,
                                 previous_quantity=prev, new_quantity=new_qty, reason=d.get('reason',''), user_id=current_user.id))
-    db.session.commit(); emit_inventory(p,new_qty-prev,d.get('reason',''))
+    db.session.commit(); reporting.cache.invalidate(report='inventory_report'); catalog.invalidate(); emit_inventory(p,new_qty-prev,d.get('reason',''))
+    today_stats.record(low_stock=today_stats.low_stock_change([(prev, new_qty, p.min_stock)]))
     return jsonify({'success':True,'message':'Cập nhật tồn kho thành công','new_quantity':new_qty})
 
-@main.route('/api/sale/<int:id>/cancel', methods=['POST'])
+@main_bp.route('/api/inventory/stock-as-of')
+@login_required
+def stock_as_of():
+    try: at=datetime.strptime(request.args.get('date',''), '%Y-%m-%d') + timedelta(days=1) - timedelta(microseconds=1)
+    except ValueError: return jsonify({'success':False,'message':'date phải có dạng YYYY-MM-DD'}),400
+    ids=[int(i) for i in request.args.getlist('product_id') if i.isdigit()] or None
+    stock=inventory_history.stock_as_of(at, ids)
+    return jsonify({'success':True,'at':at.isoformat(),'items':[{'product_id':pid,'stock_quantity':qty} for pid,qty in sorted(stock.items())]})
+
+@main_bp.route('/api/inventory/bulk-adjust', methods=['POST'])
+@login_required
+def bulk_adjust_inventory():
+    d=request.get_json(silent=True) or {}
+    if not isinstance(d.get('items'), list): return jsonify({'success':False,'message':'Thiếu danh sách items'}),400
+    try: result=bulk_inventory.adjust(current_user, d['items'], d.get('reason',''))
+    except BulkError as e: db.session.rollback(); return jsonify({'success':False,'message':str(e),'errors':e.errors}),400
+    return jsonify(dict(result, success=True, message=f'Đã điều chỉnh {result["products"]} sản phẩm'))
+
+@main_bp.route('/api/products/import', methods=['POST'])
+@login_required
+def import_products():
+    f=request.files.get('file')
+    if not f or not f.filename: return jsonify({'success':False,'message':'Chưa chọn file'}),400
+    try: result=bulk_inventory.import_products(current_user, f)
+    except BulkError as e: db.session.rollback(); return jsonify({'success':False,'message':str(e),'errors':e.errors}),400
+    return jsonify(dict(result, success=True, message=f'Thêm {result["created"]}, cập nhật {result["updated"]} sản phẩm'))
+
+@main_bp.route('/api/sale/<int:id>/cancel', methods=['POST'])
 @login_required
 def cancel_sale(id):
     s=Sale.query.get_or_404(id)
     if s.status=='cancelled': return jsonify({'success':False,'message':'Đơn hàng đã hủy'}),400
+    was_completed, stock_changes = s.status=='completed', []
     for i in s.sale_items:
         p=Product.query.get(i.product_id)
+        if p: stock_changes.append((p.stock_quantity, p.stock_quantity+i.quantity, p.min_stock))
         if p: p.stock_quantity+=i.quantity; db.session.add(InventoryLog(product_id=p.id, change_type='return', quantity_change=i.quantity,
                 previous_quantity=p.stock_quantity-i.quantity,new_quantity=p.stock_quantity, reason=f'Hủy đơn hàng #{s.sale_code}', reference=str(s.id), user_id=current_user.id))
-    s.status='cancelled'; db.session.commit(); socketio.emit('sale_update',{'sale_code':s.sale_code,'status':'cancelled','user':current_user.username})
+    if s.status=='completed': sales_summary.apply_sale(s, -1); customer_metrics.apply_sale(s, -1)
+    s.status='cancelled'; db.session.commit(); reporting.invalidate_sale(s); catalog.invalidate(); events.publish_sale({'sale_code':s.sale_code,'status':'cancelled','user':current_user.username})
+    low_stock=today_stats.low_stock_change(stock_changes)
+    if was_completed: today_stats.record_sale(s, -1, low_stock=low_stock)
+    else: today_stats.record(low_stock=low_stock)
     return jsonify({'success':True,'message':'Đơn hàng đã hủy'})
 
-@main.route('/api/sale/<int:id>/complete', methods=['POST'])
+@main_bp.route('/api/sale/<int:id>/complete', methods=['POST'])
 @login_required
 def complete_sale(id):
     s=Sale.query.get_or_404(id)
     if s.status=='completed': return jsonify({'success':False,'message':'Đơn hàng đã hoàn thành'}),400
-    s.status='completed'; db.session.commit(); return jsonify({'success':True,'message':'Đơn hàng đã hoàn thành'})
+    # Đơn đã huỷ đã trả hàng về kho: không cho hoàn thành lại (bảng tổng hợp / chỉ số khách hàng chỉ nhận pending -> completed)
+    if s.status!='pending': return jsonify({'success':False,'message':'Chỉ hoàn thành được đơn hàng đang chờ'}),400
+    sales_summary.apply_sale(s); customer_metrics.apply_sale(s)
+    s.status='completed'; db.session.commit(); reporting.invalidate_sale(s)
+    today_stats.record_sale(s)
+    return jsonify({'success':True,'message':'Đơn hàng đã hoàn thành'})
 
 # ===== EXPORT =====
-@main.route('/api/sales/export')
+def export_response(query, columns, name):
+    return exports.stream_response(query, columns, request.args.get('format','csv'),
+                                   f'{name}_{datetime.now().strftime("%Y%m%d_%H%M%S")}',
+                                   request.accept_encodings['gzip'] > 0)  # chất lượng 0 (gzip;q=0) nghĩa là từ chối
+
+@main_bp.route('/api/sales/export')
 @login_required
-def export_sales(): return jsonify({'filename':f'sales_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json',
-                                    'data':[{'sale_code':s.sale_code,'customer':s.customer.name if s.customer else 'Khách lẻ',
-                                             'date':s.sale_date.strftime('%d/%m/%Y %H:%M'),'total_amount':float(s.total_amount),
-                                             'payment_method':s.payment_method,'status':s.status} for s in filter_sales(request.args.get('search',''),
-                                                                                                                      request.args.get('date_from',''),
-                                                                                                                      request.args.get('date_to',''))],
-                                    'count':len(filter_sales(request.args.get('search',''),request.args.get('date_from',''),request.args.get('date_to','')))})
+def export_sales():
+    query = filter_sales(request.args.get('search',''), request.args.get('date_from',''), request.args.get('date_to','')) \
+        .outerjoin(Customer, Sale.customer_id==Customer.id) \
+        .with_entities(Sale.sale_code, func.coalesce(Customer.name, 'Khách lẻ'), Sale.sale_date, Sale.total_amount,
+                       Sale.payment_method, Sale.status).order_by(Sale.sale_date.desc(), Sale.id.desc())
+    return export_response(query, ['sale_code','customer','date','total_amount','payment_method','status'], 'sales_export')
 
-@main.route('/api/inventory/export')
+@main_bp.route('/api/sales/export/history')
 @login_required
-def export_inventory(): 
-    plist=Product.query.order_by(Product.name).all()
-    return jsonify({'filename':f'inventory_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json',
-                    'data':[{'name':p.name,'sku':p.sku,'category':p.category,'price':float(p.price),
-                             'stock':p.stock_quantity,'min_stock':p.min_stock,
-                             'status':'Hết hàng' if p.stock_quantity==0 else 'Sắp hết' if p.stock_quantity<=p.min_stock else 'Đủ hàng',
-                             'value':float(p.stock_quantity*p.price)} for p in plist],
-                    'total_products':len(plist),'total_value':sum(p.stock_quantity*p.price for p in plist)})
+def export_sales_history():
+    try: start, end = reporting.period_range(request.args.get('period','month'), request.args.get('start_date'), request.args.get('end_date'))
+    except ValueError as e: return jsonify({'success':False,'message':str(e)}),400
+    return export_response(exports.sales_lines_query(start, end), exports.SALES_LINE_COLUMNS, f'sales_history_{start:%Y%m%d}_{end:%Y%m%d}')
 
-@main.route('/api/reports/export/<report_type>')
+@main_bp.route('/api/inventory/export')
+@login_required
+def export_inventory():
+    return export_response(exports.inventory_query(), exports.INVENTORY_COLUMNS, 'inventory_export')
+
+@main_bp.route('/api/reports/export/<report_type>', methods=['POST'])
 @login_required
 def export_report(report_type):
-    return jsonify({'success':True,'message':f'Báo cáo {report_type} đang tạo','filename':f'report_{report_type}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'})
+    args = request.get_json(silent=True) or request.form.to_dict()
+    return submit_job_response('report', dict(args, report_type=report_type))
+
+# ===== BACKGROUND JOBS =====
+def job_dict(job):
+    d = {k: job[k] for k in ('id','type','params','status','created_at','started_at','finished_at','error','cached')}
+    d['status_url'] = url_for('main.job_status', job_id=job['id'])
+    if job['status']=='done': d['download_url'] = url_for('main.job_download', job_id=job['id'])
+    return d
+
+def submit_job_response(kind, args):
+    try: job = jobs.submit(kind, args, current_user)
+    except ValueError as e: return jsonify({'success':False,'message':str(e)}),400
+    return jsonify(dict(job_dict(job), success=True)), 200 if job['status']=='done' else 202
+
+def own_job(job_id):
+    # Job của người khác coi như không tồn tại (trừ admin)
+    job = jobs.get(job_id)
+    return job if job and (job['user_id']==current_user.id or current_user.role=='admin') else None
+
+@main_bp.route('/api/jobs', methods=['POST'])
+@login_required
+def submit_job():
+    args = request.get_json(silent=True) or request.form.to_dict()
+    return submit_job_response(args.get('type',''), args)
+
+@main_bp.route('/api/jobs/<job_id>')
+@login_required
+def job_status(job_id):
+    job = own_job(job_id)
+    if not job: return jsonify({'success':False,'message':'Không tìm thấy job'}),404
+    return jsonify(dict(job_dict(job), success=True))
+
+@main_bp.route('/api/jobs/<job_id>/download')
+@login_required
+def job_download(job_id):
+    job = own_job(job_id)
+    if not job or job['status']!='done': abort(404)
+    path = jobs.result_path(job)
+    if not os.path.exists(path): abort(410)  # file cache đã bị dọn, tạo job mới
+    return send_file(path, as_attachment=True, download_name=f'{job["key"]}.xlsx', conditional=True, max_age=0)
+
+# ===== METRICS =====
+@main_bp.route('/api/metrics')
+@login_required
+def metrics():
+    if current_user.role != 'admin': return jsonify({'success':False,'message':'Không có quyền truy cập'}),403
+    return Response(instrumentation.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 # ===== REPORTS PAGE =====
-@main.route('/reports')
+@main_bp.route('/reports')
 @login_required
 def reports():
-    # Dữ liệu mẫu cho template test
-    monthly_sales = [
-        {'month': 'Tháng 1', 'total_sales': 12000000, 'transaction_count': 15},
-        {'month': 'Tháng 2', 'total_sales': 15000000, 'transaction_count': 20},
-        {'month': 'Tháng 3', 'total_sales': 18000000, 'transaction_count': 25},
-    ]
-
-    sales_by_category = [
-        type('Category', (), {'0':'Điện thoại','total_sales':5000000,'total_quantity':10}),
-        type('Category', (), {'0':'Laptop','total_sales':12000000,'total_quantity':8}),
-        type('Category', (), {'0':'Phụ kiện','total_sales':3000000,'total_quantity':15}),
-    ]
-
-    top_products = [
-        type('Product', (), {'0':'iPhone 14','total_sold':5,'total_revenue':25000000}),
-        type('Product', (), {'0':'MacBook Pro','total_sold':3,'total_revenue':36000000}),
-        type('Product', (), {'0':'Tai nghe AirPods','total_sold':7,'total_revenue':7000000}),
-    ]
-
-    return render_template(
-        'reports.html',
-        monthly_sales=monthly_sales,
-        sales_by_category=sales_by_category,
-        top_products=top_products
-    )
-
+    period = request.args.get('period', 'month')
+    if period not in reporting.PERIODS: period = 'month'
+    args = (request.args.get('start_date'), request.args.get('end_date'))
+    try: summary, performance = reporting.get_report('sales_summary', period, *args), reporting.get_report('product_performance', period, *args)
+    except ValueError as e: flash(str(e), 'danger'); return redirect(url_for('main.reports'))
+    return render_template('reports.html', period=period, monthly_sales=summary['monthly_sales'],
+                           sales_by_category=summary['sales_by_category'], top_products=performance['top_products'])
 
+@main_bp.route('/api/reports/<report_type>')
+@login_required
+def api_report(report_type):
+    if report_type not in reporting.REPORTS: return jsonify({'success':False,'message':'Loại báo cáo không hợp lệ'}),404
+    try: data = reporting.get_report(report_type, request.args.get('period','month'), request.args.get('start_date'), request.args.get('end_date'))
+    except ValueError as e: return jsonify({'success':False,'message':str(e)}),400
+    return jsonify(dict(data, success=True))
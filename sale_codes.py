@@ -0,0 +1,54 @@
+# sale_codes.py
+# Cấp mã đơn hàng SALE-YYYYMMDD-NNNNNN từ bộ đếm theo ngày (bảng sale_sequences).
+# Mỗi worker giữ trước một khối số nên phần lớn đơn hàng không tốn thêm round trip nào.
+import threading
+from flask import current_app
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
+from database import db
+from models import SaleSequence
+import today_stats
+
+PREFIX = 'SALE-'
+
+class SaleCodeAllocator:
+    def __init__(self, block_size=20):
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._day, self._next, self._last = None, 1, 0
+
+    def _reserve(self, day, size):
+        # Transaction riêng, commit ngay: khối số đã cấp không bị trả lại khi đơn hàng rollback
+        table = SaleSequence.__table__
+        for _ in range(3):
+            try:
+                with db.engine.begin() as conn:
+                    last = conn.execute(update(table).where(table.c.day == day)
+                                        .values(last_value=table.c.last_value + size)
+                                        .returning(table.c.last_value)).scalar()
+                    if last is None:
+                        conn.execute(insert(table).values(day=day, last_value=size))
+                        last = size
+                return last - size + 1, last
+            except IntegrityError:
+                continue  # worker khác vừa tạo dòng cho ngày này
+        raise RuntimeError('Không thể cấp mã đơn hàng')
+
+    def next_code(self, now=None):
+        # Ngày UTC, cùng quy ước với sale_date / bảng tổng hợp: mã đơn và ngày bán luôn khớp nhau
+        day = now.date() if now else today_stats.today()
+        with self._lock:
+            if self._day != day or self._next > self._last:
+                self._next, self._last = self._reserve(day, self.block_size)
+                self._day = day
+            n, self._next = self._next, self._next + 1
+        return f'{PREFIX}{day:%Y%m%d}-{n:06d}'
+
+allocator = SaleCodeAllocator()
+
+def next_sale_code():
+    allocator.block_size = current_app.config.get('SALE_CODE_BLOCK_SIZE', 20)
+    return allocator.next_code()
+
+def is_code_prefix(search):
+    return search.upper().startswith(PREFIX)
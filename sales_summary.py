@@ -0,0 +1,86 @@
+# sales_summary.py
+# Bảng tổng hợp doanh thu theo ngày / phương thức thanh toán (chỉ tính đơn 'completed').
+from datetime import date, datetime, timedelta
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from database import db
+from models import Sale, SaleItem, DailySalesSummary
+
+def _key(sale):
+    return (sale.sale_date or datetime.utcnow()).date(), sale.payment_method or 'other'
+
+def apply_sale(sale, sign=1, items=None):
+    """Cộng (sign=1) hoặc trừ (sign=-1) một đơn hàng vào bảng tổng hợp, trong transaction hiện tại.
+    items: tổng số lượng sản phẩm của đơn; mặc định cộng từ sale.sale_items."""
+    day, method = _key(sale)
+    if items is None: items = sum(i.quantity or 0 for i in sale.sale_items)
+    values = {
+        'revenue': DailySalesSummary.revenue + sign * (sale.total_amount or 0),
+        'transaction_count': DailySalesSummary.transaction_count + sign,
+        'discount': DailySalesSummary.discount + sign * (sale.discount or 0),
+        'tax': DailySalesSummary.tax + sign * (sale.tax or 0),
+        'item_count': DailySalesSummary.item_count + sign * items,
+        'updated_at': datetime.utcnow(),
+    }
+    query = DailySalesSummary.query.filter_by(day=day, payment_method=method)
+    if query.update(values, synchronize_session=False):
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.add(DailySalesSummary(day=day, payment_method=method, revenue=sign * (sale.total_amount or 0),
+                                             transaction_count=sign, discount=sign * (sale.discount or 0),
+                                             tax=sign * (sale.tax or 0), item_count=sign * items))
+    except IntegrityError:
+        # Worker khác vừa tạo dòng cho ngày này
+        query.update(values, synchronize_session=False)
+
+def daily_totals(start, end):
+    """{day: (revenue, transaction_count)} cho khoảng [start, end], một truy vấn duy nhất."""
+    rows = db.session.query(DailySalesSummary.day, func.sum(DailySalesSummary.revenue),
+                            func.sum(DailySalesSummary.transaction_count)) \
+        .filter(DailySalesSummary.day.between(start, end)) \
+        .group_by(DailySalesSummary.day).all()
+    return {(d if isinstance(d, date) else date.fromisoformat(str(d))): (float(r or 0), int(c or 0)) for d, r, c in rows}
+
+def totals(start=None, end=None):
+    """(doanh thu, số đơn, số sản phẩm) của các đơn 'completed' trong [start, end] (không giới hạn nếu None)."""
+    q = db.session.query(func.coalesce(func.sum(DailySalesSummary.revenue), 0), func.coalesce(func.sum(DailySalesSummary.transaction_count), 0),
+                         func.coalesce(func.sum(DailySalesSummary.item_count), 0))
+    if start: q = q.filter(DailySalesSummary.day >= start)
+    if end: q = q.filter(DailySalesSummary.day <= end)
+    revenue, count, items = q.one()
+    return float(revenue), int(count), int(items)
+
+def payment_totals(start, end):
+    """[(phương thức thanh toán, số đơn)] trong [start, end], nhiều đơn nhất trước."""
+    count = func.sum(DailySalesSummary.transaction_count)
+    rows = db.session.query(DailySalesSummary.payment_method, count).filter(DailySalesSummary.day.between(start, end)) \
+        .group_by(DailySalesSummary.payment_method).order_by(count.desc()).all()
+    return [(m, int(c or 0)) for m, c in rows if c]
+
+def rebuild(start=None, end=None):
+    """Tính lại bảng tổng hợp từ bảng sales (backfill). Trả về số dòng đã ghi."""
+    day = func.date(Sale.sale_date)
+    method = func.coalesce(Sale.payment_method, 'other')
+    q = db.session.query(day, method, func.sum(Sale.total_amount), func.count(Sale.id),
+                         func.coalesce(func.sum(Sale.discount), 0), func.coalesce(func.sum(Sale.tax), 0)) \
+        .filter(Sale.status == 'completed')
+    items_q = db.session.query(day, method, func.sum(SaleItem.quantity)).join(SaleItem, SaleItem.sale_id == Sale.id) \
+        .filter(Sale.status == 'completed')
+    delete = DailySalesSummary.query
+    if start:
+        q = q.filter(Sale.sale_date >= datetime.combine(start, datetime.min.time()))
+        items_q = items_q.filter(Sale.sale_date >= datetime.combine(start, datetime.min.time()))
+        delete = delete.filter(DailySalesSummary.day >= start)
+    if end:
+        q = q.filter(Sale.sale_date < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+        items_q = items_q.filter(Sale.sale_date < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+        delete = delete.filter(DailySalesSummary.day <= end)
+    delete.delete(synchronize_session=False)
+    items = {(str(d), m): n for d, m, n in items_q.group_by(day, method).all()}
+    rows = [DailySalesSummary(day=d if isinstance(d, date) else date.fromisoformat(str(d)), payment_method=m,
+                              revenue=r, transaction_count=c, discount=dc, tax=t, item_count=items.get((str(d), m)) or 0)
+            for d, m, r, c, dc, t in q.group_by(day, method).all()]
+    db.session.add_all(rows)
+    db.session.commit()
+    return len(rows)
@@ -0,0 +1,117 @@
+# search.py
+# Tìm kiếm không dấu cho sản phẩm, khách hàng và mã đơn hàng.
+# PostgreSQL: chỉ mục GIN trigram trên f_unaccent(lower(cột)) -> LIKE '%...%' dùng được chỉ mục.
+# SQLite: bảng ảo FTS5 search_index, cập nhật qua sự kiện ORM.
+import re, unicodedata
+from sqlalchemy import event, func, or_, select, table, column, text
+from database import db
+from models import Product, Customer, Sale
+
+FIELDS = {
+    'product': (Product, ('name', 'sku')),
+    'customer': (Customer, ('name', 'phone', 'email')),
+    'sale': (Sale, ('sale_code',)),
+}
+
+search_index = table('search_index', column('kind'), column('ref_id'), column('body'))
+
+def normalize(value):
+    """'Điện Thoại' -> 'dien thoai'"""
+    value = unicodedata.normalize('NFD', (value or '').replace('đ', 'd').replace('Đ', 'D'))
+    return ''.join(ch for ch in value if not unicodedata.combining(ch)).lower().strip()
+
+def _is_postgres():
+    return db.engine.dialect.name == 'postgresql'
+
+# ===== SCHEMA =====
+PG_DDL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE EXTENSION IF NOT EXISTS unaccent',
+    "CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text AS "
+    "$$ SELECT public.unaccent('public.unaccent', $1) $$ LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT",
+] + [f'CREATE INDEX IF NOT EXISTS ix_{model.__tablename__}_{field}_trgm ON {model.__tablename__} '
+     f'USING gin (f_unaccent(lower({field})) gin_trgm_ops)'
+     for model, fields in FIELDS.values() for field in fields]
+
+SQLITE_DDL = ["CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5("
+              "kind UNINDEXED, ref_id UNINDEXED, body, tokenize = 'unicode61 remove_diacritics 2')"]
+
+def create_index(connection):
+    for ddl in (PG_DDL if connection.dialect.name == 'postgresql' else SQLITE_DDL if connection.dialect.name == 'sqlite' else []):
+        connection.execute(text(ddl))
+
+def _body(obj, kind):
+    return normalize(' '.join(str(getattr(obj, f) or '') for f in FIELDS[kind][1]))
+
+def rebuild():
+    """Dựng lại bảng FTS (SQLite). Trả về số bản ghi đã đánh chỉ mục."""
+    if db.engine.dialect.name != 'sqlite': return 0
+    db.session.execute(search_index.delete())
+    count = 0
+    for kind, (model, fields) in FIELDS.items():
+        rows = db.session.query(model.id, *[getattr(model, f) for f in fields]).yield_per(1000)
+        batch = []
+        for row in rows:
+            batch.append({'kind': kind, 'ref_id': row[0], 'body': normalize(' '.join(str(v or '') for v in row[1:]))})
+            if len(batch) >= 1000: db.session.execute(search_index.insert(), batch); count += len(batch); batch = []
+        if batch: db.session.execute(search_index.insert(), batch); count += len(batch)
+    db.session.commit()
+    return count
+
+def reindex(kind, ids):
+    """Cập nhật bảng FTS cho các bản ghi ghi bằng bulk INSERT/UPDATE (không kích hoạt sự kiện ORM)."""
+    if not ids or db.engine.dialect.name != 'sqlite': return
+    model, fields = FIELDS[kind]
+    rows = db.session.execute(select(model.id, *[getattr(model, f) for f in fields]).where(model.id.in_(ids))).all()
+    db.session.execute(search_index.delete().where(search_index.c.kind == kind, search_index.c.ref_id.in_(ids)))
+    if rows:
+        db.session.execute(search_index.insert(), [{'kind': kind, 'ref_id': row[0],
+                                                    'body': normalize(' '.join(str(v or '') for v in row[1:]))} for row in rows])
+
+def _sync(kind):
+    def after_write(mapper, connection, target):
+        if connection.dialect.name != 'sqlite': return
+        connection.execute(search_index.delete().where(search_index.c.kind == kind, search_index.c.ref_id == target.id))
+        connection.execute(search_index.insert().values(kind=kind, ref_id=target.id, body=_body(target, kind)))
+    def after_delete(mapper, connection, target):
+        if connection.dialect.name != 'sqlite': return
+        connection.execute(search_index.delete().where(search_index.c.kind == kind, search_index.c.ref_id == target.id))
+    return after_write, after_delete
+
+for _kind, (_model, _) in FIELDS.items():
+    _write, _delete = _sync(_kind)
+    event.listen(_model, 'after_insert', _write)
+    event.listen(_model, 'after_update', _write)
+    event.listen(_model, 'after_delete', _delete)
+
+# ===== QUERY =====
+def _fts_query(term):
+    tokens = re.findall(r'\w+', term)
+    return ' '.join(f'"{t}"*' for t in tokens)
+
+def matches(kind, term, dialect=None):
+    """Điều kiện WHERE cho `term` trên bảng `kind`; None nếu không có gì để tìm."""
+    model, fields = FIELDS[kind]
+    term = normalize(term)
+    if not term: return None
+    dialect = dialect or db.engine.dialect.name
+    if dialect == 'postgresql':
+        pattern = '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        return or_(*[func.f_unaccent(func.lower(getattr(model, f))).like(pattern, escape='\\') for f in fields])
+    if dialect == 'sqlite':
+        fts = _fts_query(term)
+        if not fts: return None
+        ids = select(search_index.c.ref_id).where(search_index.c.kind == kind, text('search_index MATCH :fts').bindparams(fts=fts))
+        return model.id.in_(ids)
+    return or_(*[getattr(model, f).ilike(f'%{term}%') for f in fields])
+
+def typeahead(term, limit=10, in_stock=True):
+    criterion = matches('product', term)
+    if criterion is None: return []
+    query = Product.query.filter(criterion)
+    if in_stock: query = query.filter(Product.stock_quantity > 0)
+    if _is_postgres():
+        query = query.order_by(func.similarity(func.f_unaccent(func.lower(Product.name)), normalize(term)).desc(), Product.name)
+    else:
+        query = query.order_by(Product.name)
+    return query.limit(limit).all()
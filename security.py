@@ -0,0 +1,81 @@
+# security.py
+# Băm mật khẩu theo cấu hình (tự băm lại khi đăng nhập nếu hash cũ khác cấu hình)
+# và giới hạn số lần đăng nhập để các đợt dò mật khẩu không chiếm worker bằng check_password_hash.
+import threading, time
+from collections import deque
+from flask import current_app
+from werkzeug.security import generate_password_hash
+
+# PASSWORD_HASH_PROFILE -> method của werkzeug; PASSWORD_HASH_METHOD (nếu đặt) được ưu tiên
+HASH_PROFILES = {
+    'standard': 'pbkdf2:sha256:600000',
+    'scrypt': 'scrypt:32768:8:1',
+    'low': 'pbkdf2:sha256:260000',  # máy POS cấu hình yếu
+}
+
+def hash_method():
+    config = current_app.config
+    return config.get('PASSWORD_HASH_METHOD') or HASH_PROFILES[config.get('PASSWORD_HASH_PROFILE', 'standard')]
+
+def hash_password(password):
+    return generate_password_hash(password, method=hash_method())
+
+def needs_rehash(password_hash):
+    return (password_hash or '').split('$', 1)[0] != hash_method()
+
+# ===== GIỚI HẠN ĐĂNG NHẬP =====
+class RateLimiter:
+    """Cửa sổ trượt trong bộ nhớ của tiến trình: tối đa `limit` lần trong `window` giây cho mỗi khoá."""
+    def __init__(self, max_keys=10000):
+        self._lock = threading.Lock()
+        self._hits = {}
+        self.max_keys = max_keys
+
+    def _recent(self, key, window, now):
+        hits = self._hits.get(key)
+        while hits and hits[0] <= now - window: hits.popleft()
+        return hits
+
+    def retry_after(self, key, limit, window):
+        """Số giây phải chờ nếu `key` đã vượt giới hạn, ngược lại 0."""
+        now = time.monotonic()
+        with self._lock:
+            hits = self._recent(key, window, now)
+            return int(hits[0] + window - now) + 1 if hits and len(hits) >= limit else 0
+
+    def hit(self, key, window):
+        now = time.monotonic()
+        with self._lock:
+            hits = self._recent(key, window, now)
+            if hits is None:
+                if len(self._hits) >= self.max_keys: self._prune(window, now)
+                hits = self._hits[key] = deque()
+            hits.append(now)
+
+    def reset(self, key):
+        with self._lock: self._hits.pop(key, None)
+
+    def _prune(self, window, now):
+        for key in [k for k, hits in self._hits.items() if not hits or hits[-1] <= now - window]:
+            del self._hits[key]
+
+limiter = RateLimiter()
+
+def _limits():
+    config = current_app.config
+    return (config.get('LOGIN_RATE_LIMIT_IP', 20), config.get('LOGIN_RATE_LIMIT_USER', 5), config.get('LOGIN_RATE_WINDOW', 300))
+
+def login_retry_after(ip, username):
+    """Kiểm tra trước khi băm mật khẩu: > 0 nghĩa là từ chối ngay."""
+    ip_limit, user_limit, window = _limits()
+    return max(limiter.retry_after(('ip', ip), ip_limit, window),
+               limiter.retry_after(('user', (username or '').lower()), user_limit, window))
+
+def record_login(ip, username, success):
+    # Chỉ đếm lần sai: cả cửa hàng có thể chung một IP (NAT / proxy), đăng nhập đúng không được làm khoá IP.
+    # Đăng nhập đúng không xoá bộ đếm IP, nếu không kẻ dò mật khẩu tự xoá được bằng tài khoản của mình.
+    _, _, window = _limits()
+    user_key = ('user', (username or '').lower())
+    if success: limiter.reset(user_key); return
+    limiter.hit(('ip', ip), window)
+    limiter.hit(user_key, window)
@@ -211,24 +211,6 @@ document.addEventListener("DOMContentLoaded", function () {
         }
     }
 
-    // Auto-refresh dashboard every 30 seconds
-    if (window.location.pathname === "/") {
-        setInterval(function () {
-            fetch("/api/sales/today")
-                .then((response) => response.json())
-                .then((data) => {
-                    // Update dashboard stats
-                    const salesElements = document.querySelectorAll(
-                        ".text-2xl.font-semibold.text-gray-900"
-                    );
-                    if (salesElements.length > 0) {
-                        // This is a simplified update - in real implementation,
-                        // you'd update the correct element
-                    }
-                });
-        }, 30000);
-    }
-
     // Print functionality for receipts and reports
     window.printReceipt = function () {
         window.print();
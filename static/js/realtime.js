@@ -4,9 +4,23 @@ document.addEventListener("DOMContentLoaded", function () {
     // Connect to Socket.IO server
     const socket = io();
 
+    // Rooms: the server only sends page-specific events (e.g. batched
+    // inventory updates) to clients that joined that page's room
+    const pageRooms = {
+        "/": "dashboard",
+        "/products": "products",
+        "/inventory": "inventory",
+        "/sales": "sales",
+        "/sale/new": "pos",
+    };
+
     // Connection status
     socket.on("connect", function () {
         console.log("Connected to real-time server");
+        const page = pageRooms[window.location.pathname];
+        if (page) {
+            socket.emit("join_page", page);
+        }
     });
 
     socket.on("disconnect", function () {
@@ -28,17 +42,37 @@ document.addEventListener("DOMContentLoaded", function () {
             "success"
         );
 
-        // Update dashboard if on dashboard page
-        if (window.location.pathname === "/") {
-            updateDashboardStats();
-        }
-
         // Update sales list if on sales page
         if (window.location.pathname === "/sales") {
             updateSalesList();
         }
     });
 
+    // POS keeps a local catalog copy; pull the delta when stock changes
+    function syncPosCatalog() {
+        if (typeof window.syncCatalog === "function") window.syncCatalog();
+    }
+    socket.on("inventory_update", syncPosCatalog);
+    socket.on("sale_update", syncPosCatalog);
+
+    // Bulk adjustments / imports arrive as one summary event
+    socket.on("inventory_bulk", function (data) {
+        syncPosCatalog();
+        showNotification(
+            "Cập nhật tồn kho",
+            `${data.user} đã cập nhật ${data.products} sản phẩm`,
+            "info"
+        );
+
+        if (window.location.pathname === "/inventory") {
+            updateInventoryList();
+        }
+
+        if (window.location.pathname === "/products") {
+            updateProductsList();
+        }
+    });
+
     // Handle inventory updates
     socket.on("stock_update", function (data) {
         console.log("Stock update:", data);
@@ -159,28 +193,6 @@ document.addEventListener("DOMContentLoaded", function () {
     }
 
     // Update functions
-    function updateDashboardStats() {
-        fetch("/api/sales/today")
-            .then((response) => response.json())
-            .then((data) => {
-                // Update sales stats
-                const salesElements = document.querySelectorAll(
-                    ".text-2xl.font-semibold.text-gray-900"
-                );
-                if (salesElements.length > 0) {
-                    // This would need to be more specific in a real implementation
-                    console.log("Dashboard updated:", data);
-                }
-            });
-
-        fetch("/api/inventory/low-stock")
-            .then((response) => response.json())
-            .then((data) => {
-                // Update low stock count
-                console.log("Low stock items:", data);
-            });
-    }
-
     function updateSalesList() {
         // Refresh sales table
         location.reload();
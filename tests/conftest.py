@@ -0,0 +1,38 @@
+# tests/conftest.py
+# App chạy trên một file SQLite tạm; DATABASE_URL phải đặt trước khi import app.
+import os, sys, tempfile
+
+_db_dir = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(_db_dir, "test.db")}'
+os.environ.setdefault('FLASK_ENV', 'testing')
+os.environ['SQL_PROFILING'] = '1'  # Server-Timing / /api/metrics có trong test
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from app import app as flask_app, init_db
+from database import db
+from models import User, Product
+
+@pytest.fixture
+def app():
+    flask_app.config.update(TESTING=True, SOCKETIO_BATCH_WINDOW=0, EXPORT_DIR=os.path.join(_db_dir, 'exports'))
+    with flask_app.app_context():
+        init_db()
+        yield flask_app
+        db.session.remove()
+
+@pytest.fixture
+def admin(app):
+    return User.query.filter_by(username='admin').one()
+
+@pytest.fixture
+def product(app):
+    p = Product(name='Bút bi', sku=f'TEST-{os.urandom(4).hex()}', price=10000, stock_quantity=2, min_stock=1)
+    db.session.add(p); db.session.commit()
+    return p
+
+@pytest.fixture
+def client(app):
+    c = app.test_client()
+    c.post('/login', data={'username': 'admin', 'password': 'admin123'})
+    return c
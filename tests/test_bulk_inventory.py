@@ -0,0 +1,47 @@
+# tests/test_bulk_inventory.py
+import pytest
+from sqlalchemy import update
+import bulk_inventory
+from bulk_inventory import BulkError
+from database import db
+from models import Product
+
+def _stock(*products):
+    db.session.expire_all()
+    return [db.session.get(Product, p.id).stock_quantity for p in products]
+
+@pytest.fixture
+def other(app):
+    p = Product(name='Thước', sku='TEST-RULER', price=5000, stock_quantity=5, min_stock=1)
+    db.session.add(p); db.session.commit()
+    yield p
+    db.session.rollback(); db.session.delete(db.session.get(Product, p.id)); db.session.commit()
+
+def test_adjust_is_all_or_nothing_across_chunks(app, admin, product, other, monkeypatch):
+    app.config['BULK_CHUNK_SIZE'] = 1
+    resolve = bulk_inventory._resolve
+    def resolve_then_sell(parsed):
+        stock = resolve(parsed)
+        # Đơn hàng khác bán hết sản phẩm thứ hai sau khi kiểm tra
+        db.session.execute(update(Product).where(Product.id == other.id).values(stock_quantity=0))
+        return stock
+    monkeypatch.setattr(bulk_inventory, '_resolve', resolve_then_sell)
+    with pytest.raises(BulkError):
+        bulk_inventory.adjust(admin, [{'product_id': product.id, 'type': 'increase', 'quantity': 1},
+                                      {'product_id': other.id, 'type': 'decrease', 'quantity': 3}])
+    assert _stock(product, other) == [2, 5]
+    app.config.pop('BULK_CHUNK_SIZE')
+
+def test_adjust_rejects_product_deleted_after_validation(admin, product, monkeypatch):
+    def resolve_deleted(parsed):
+        for _, a in parsed: a['product_id'] = 999999  # có lúc kiểm tra, mất lúc đọc lại dưới khoá
+        return {999999: 2}
+    monkeypatch.setattr(bulk_inventory, '_resolve', resolve_deleted)
+    with pytest.raises(BulkError) as e:
+        bulk_inventory.adjust(admin, [{'product_id': product.id, 'type': 'increase', 'quantity': 1}])
+    assert e.value.errors[0]['row'] == 0
+
+@pytest.mark.parametrize('value', ['inf', '-inf', 'nan', 'abc'])
+def test_import_rejects_non_finite_quantities(value):
+    with pytest.raises(ValueError):
+        bulk_inventory._parse_product({'sku': 'X', 'stock_quantity': value})
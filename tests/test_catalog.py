@@ -0,0 +1,36 @@
+# tests/test_catalog.py
+import pytest
+from database import db
+
+@pytest.fixture(autouse=True)
+def no_ttl(app):
+    # Fixture ghi thẳng vào DB, không qua route có catalog.invalidate()
+    app.config['CATALOG_CACHE_TTL'] = 0
+    yield
+    app.config.pop('CATALOG_CACHE_TTL')
+
+def _sync(client, since=''):
+    return client.get(f'/api/catalog?since={since}').get_json()
+
+def test_delta_returns_changed_products(client, product):
+    base = _sync(client)
+    assert base['full'] and product.id in [row[0] for row in base['products']]
+    product.price = 12000; db.session.commit()
+    delta = _sync(client, base['version'])
+    assert not delta['full'] and [row[0] for row in delta['products']] == [product.id]
+    assert delta['products'][0][delta['columns'].index('price')] == 12000
+
+def test_deleted_product_leaves_tombstone(client, product):
+    base = _sync(client)
+    assert client.get(f'/product/delete/{product.id}').status_code == 302
+    delta = _sync(client, base['version'])
+    assert delta['deleted'] == [product.id] and not delta['products']
+
+def test_unchanged_catalog_is_304(client, product):
+    base = _sync(client)
+    response = client.get(f'/api/catalog?since={base["version"]}', headers={'If-None-Match': f'"{base["version"]}"'})
+    assert response.status_code == 304
+
+def test_unknown_version_gets_full_catalog(client, product):
+    data = _sync(client, 'other.3')
+    assert data['full'] and product.id in [row[0] for row in data['products']]
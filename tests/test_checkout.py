@@ -0,0 +1,42 @@
+# tests/test_checkout.py
+import pytest
+from checkout import checkout, CheckoutError
+from database import db
+from models import Product, Sale
+
+def _stock(product):
+    db.session.expire_all()
+    return db.session.get(Product, product.id).stock_quantity
+
+def _sales():
+    return db.session.query(Sale).count()
+
+def test_checkout_decrements_stock(admin, product):
+    sale = checkout(admin, [{'product_id': product.id, 'quantity': 2}], discount='5000', tax='1000')
+    assert sale.total_amount == 20000 - 5000 + 1000
+    assert _stock(product) == 0
+
+def test_oversell_rejected(admin, product):
+    before = _sales()
+    with pytest.raises(CheckoutError):
+        checkout(admin, [{'product_id': product.id, 'quantity': 3}])
+    db.session.rollback()
+    assert _stock(product) == 2 and _sales() == before
+
+@pytest.mark.parametrize('item, kwargs', [
+    ({'unit_price': '-1'}, {}),
+    ({}, {'discount': '-100'}),
+    ({}, {'tax': '-100'}),
+    ({}, {'discount': '10001'}),  # lớn hơn tạm tính 10.000 + thuế 0
+    ({'unit_price': 'NaN'}, {}),
+])
+def test_invalid_amounts_rejected(admin, product, item, kwargs):
+    before = _sales()
+    with pytest.raises(CheckoutError):
+        checkout(admin, [dict({'product_id': product.id, 'quantity': 1}, **item)], **kwargs)
+    db.session.rollback()
+    assert _stock(product) == 2 and _sales() == before
+
+def test_non_list_items_flash_instead_of_500(client, product):
+    response = client.post('/sale/new', data={'items': '5'})
+    assert response.status_code == 302 and response.headers['Location'].endswith('/sale/new')
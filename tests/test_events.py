@@ -0,0 +1,40 @@
+# tests/test_events.py
+import time
+import pytest
+from events import batcher, socketio
+
+@pytest.fixture
+def sockets(app, client):
+    pages = {}
+    for page in ('inventory', 'dashboard'):
+        sock = socketio.test_client(app, flask_test_client=client)
+        assert sock.is_connected() and sock.emit('join_page', page, callback=True)
+        sock.get_received()
+        pages[page] = sock
+    yield pages
+    for sock in pages.values(): sock.disconnect()
+
+def _events(sock, name):
+    return [e['args'][0] for e in sock.get_received() if e['name'] == name]
+
+def test_adjustments_coalesced_within_window(client, product, sockets, monkeypatch):
+    monkeypatch.setattr(batcher, 'window', 0.2)
+    for _ in range(5):
+        response = client.post('/api/inventory/adjust', json={'product_id': product.id, 'type': 'increase',
+                                                              'quantity': 1, 'reason': 'test'})
+        assert response.get_json()['success']
+    assert _events(sockets['inventory'], 'inventory_update') == []  # chưa hết cửa sổ gộp
+    time.sleep(0.5)
+    (message,) = _events(sockets['inventory'], 'inventory_update')
+    assert message['count'] == 1
+    update = message['updates'][0]
+    assert (update['product_id'], update['change'], update['previous_quantity'], update['new_quantity']) == (product.id, 5, 2, 7)
+    assert _events(sockets['dashboard'], 'inventory_update') == []  # chỉ phòng của trang tồn kho / sản phẩm / POS
+
+def test_zero_window_emits_immediately(client, product, sockets, monkeypatch):
+    monkeypatch.setattr(batcher, 'window', 0)
+    client.post('/api/inventory/adjust', json={'product_id': product.id, 'type': 'decrease', 'quantity': 1, 'reason': 'test'})
+    (message,) = _events(sockets['inventory'], 'inventory_update')
+    assert message['updates'][0]['change'] == -1
+    (alert,) = _events(sockets['dashboard'], 'stock_update')  # 2 -> 1 <= min_stock: cảnh báo tới cả cửa hàng
+    assert alert['product_id'] == product.id
@@ -0,0 +1,8 @@
+# tests/test_exports.py
+import gzip
+
+def test_export_gzip_only_when_accepted(client, product):
+    plain = client.get('/api/inventory/export', headers={'Accept-Encoding': 'gzip;q=0'})
+    assert 'Content-Encoding' not in plain.headers and b'sku' in plain.get_data()
+    packed = client.get('/api/inventory/export', headers={'Accept-Encoding': 'deflate, gzip'})
+    assert packed.headers['Content-Encoding'] == 'gzip' and gzip.decompress(packed.get_data()) == plain.get_data()
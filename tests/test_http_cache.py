@@ -0,0 +1,14 @@
+# tests/test_http_cache.py
+from checkout import checkout
+from database import db
+
+def test_sale_detail_etag_follows_product_changes(client, admin, product):
+    sale = checkout(admin, [{'product_id': product.id, 'quantity': 1}])
+    url = f'/sale/{sale.id}'
+    client.get(url)  # hiện flash "đăng nhập thành công"; trang có flash không gắn ETag
+    first = client.get(url)
+    assert first.status_code == 200
+    assert client.get(url, headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+    product.name = 'Bút chì'; db.session.commit()
+    renamed = client.get(url, headers={'If-None-Match': first.headers['ETag']})
+    assert renamed.status_code == 200 and 'Bút chì' in renamed.get_data(as_text=True)
@@ -0,0 +1,26 @@
+# tests/test_instrumentation.py
+import re
+from instrumentation import registry
+
+def _queries(response):
+    timing = ', '.join(response.headers.getlist('Server-Timing'))
+    match = re.search(r'desc="(\d+) queries"', timing)
+    return int(match.group(1)) if match else None
+
+def test_server_timing_counts_queries(client):
+    response = client.get('/api/sales/today')
+    assert _queries(response) >= 1 and 'app;dur=' in ', '.join(response.headers.getlist('Server-Timing'))
+
+def test_streamed_export_recorded_when_closed(client, product):
+    registry.reset()
+    response = client.get('/api/inventory/export')
+    assert response.get_data() and _queries(response) is None  # header gửi trước khi body chạy SQL
+    response.close()
+    requests, _, queries, _, _, _ = registry.snapshot()['main.export_inventory']
+    assert requests == 1 and queries >= 1
+
+def test_metrics_endpoint_renders_prometheus(client):
+    client.get('/api/sales/today')
+    body = client.get('/api/metrics').get_data(as_text=True)
+    assert re.search(r'^salespro_requests_total\{endpoint="main.sales_today"\} \d+$', body, re.M)
+    assert '# TYPE salespro_db_queries_total counter' in body
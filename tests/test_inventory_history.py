@@ -0,0 +1,33 @@
+# tests/test_inventory_history.py
+from datetime import datetime
+import inventory_history
+from database import db
+from models import InventoryLog, StockSnapshot
+
+def _history(admin, product):
+    # Tồn kho: 0 -> +5 (01/02) -> -3 (01/03) = 2 (tồn hiện tại của fixture)
+    product.created_at = datetime(2024, 1, 1)
+    for at, change, prev in ((datetime(2024, 2, 1), 5, 0), (datetime(2024, 3, 1), -3, 5)):
+        db.session.add(InventoryLog(product_id=product.id, change_type='adjustment', quantity_change=change,
+                                    previous_quantity=prev, new_quantity=prev + change, created_at=at, user_id=admin.id))
+    db.session.commit()
+
+def _as_of(product):
+    return [inventory_history.stock_as_of(datetime(2024, m, 15), [product.id]).get(product.id) for m in (1, 2, 3)]
+
+def test_stock_as_of_same_before_and_after_archive(admin, product):
+    _history(admin, product)
+    assert _as_of(product) == [0, 5, 2]
+    assert inventory_history.archive(datetime(2024, 2, 15)) >= 1
+    assert _as_of(product) == [0, 5, 2]
+    inventory_history.take_snapshot()
+    assert _as_of(product) == [0, 5, 2]
+
+def test_prune_keeps_recent_snapshots(admin, product):
+    _history(admin, product)
+    for at in (datetime(2024, 1, 20), datetime(2024, 2, 20)): inventory_history.take_snapshot(at=at)
+    recent = inventory_history.take_snapshot()
+    assert inventory_history.prune_snapshots(datetime(2024, 3, 1)) >= 2
+    taken = {t for t, in db.session.query(StockSnapshot.taken_at).distinct()}
+    assert taken and min(taken) >= datetime(2024, 3, 1) and recent
+    assert _as_of(product) == [0, 5, 2]  # ngày cũ tra ngược từ snapshot còn giữ
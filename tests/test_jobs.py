@@ -0,0 +1,27 @@
+# tests/test_jobs.py
+import os
+from flask import g
+from database import db
+from models import User
+
+def _staff_client(app):
+    name = f'staff-{os.urandom(4).hex()}'
+    user = User(username=name, email=f'{name}@example.com', role='staff')
+    user.set_password('secret123')
+    db.session.add(user); db.session.commit()
+    c = app.test_client()
+    g.pop('_login_user', None)  # các request trong test dùng chung app context của fixture
+    c.post('/login', data={'username': name, 'password': 'secret123'})
+    return c
+
+def test_report_export_requires_post(client):
+    assert client.get('/api/reports/export/sales_summary?period=today').status_code == 405
+
+def test_jobs_are_private_to_their_owner(app, client):
+    job = client.post('/api/reports/export/sales_summary', json={'period': 'today'}).get_json()
+    assert job['success']
+    other = _staff_client(app)
+    assert other.get(f'/api/jobs/{job["id"]}').status_code == 404
+    assert other.get(f'/api/jobs/{job["id"]}/download').status_code == 404
+    g.pop('_login_user', None)
+    assert client.get(f'/api/jobs/{job["id"]}').status_code == 200
@@ -0,0 +1,42 @@
+# tests/test_migrations.py
+from sqlalchemy import create_engine, inspect, text
+import migrations
+from database import db
+
+def test_fresh_database_matches_models(app, tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path / "fresh.db"}')
+    migrations.upgrade(engine)
+    insp = inspect(engine)
+    for table in db.metadata.sorted_tables:
+        assert {c.name for c in table.columns} <= {c['name'] for c in insp.get_columns(table.name)}, table.name
+        indexes = {i['name'] for i in insp.get_indexes(table.name)}
+        assert {i.name for i in table.indexes if not i._ddl_if} <= indexes, table.name
+    assert not migrations.missing_indexes(engine)
+
+def test_customer_metrics_backfilled(app, tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path / "old.db"}')
+    migrations.upgrade(engine, target=4)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO users (id, username, email, password_hash) VALUES (1, 'u', 'u@x', 'x')"))
+        conn.execute(text("INSERT INTO customers (id, name) VALUES (1, 'A')"))
+        conn.execute(text("INSERT INTO sales (sale_code, customer_id, user_id, total_amount, status, sale_date) VALUES "
+                          "('S1', 1, 1, 100, 'completed', '2024-01-02 10:00:00'), ('S2', 1, 1, 50, 'cancelled', '2024-01-03 10:00:00')"))
+    migrations.upgrade(engine)
+    with engine.connect() as conn:
+        assert tuple(conn.execute(text('SELECT order_count, total_spent FROM customers')).one()) == (1, 100)
+
+def test_sales_summary_backfilled(app, tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path / "old.db"}')
+    migrations.upgrade(engine, target=1)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO users (id, username, email, password_hash) VALUES (1, 'u', 'u@x', 'x')"))
+        conn.execute(text("INSERT INTO products (id, name, sku, price) VALUES (1, 'P', 'P-1', 50)"))
+        conn.execute(text("INSERT INTO sales (id, sale_code, user_id, total_amount, status, payment_method, sale_date) VALUES "
+                          "(1, 'S1', 1, 100, 'completed', 'cash', '2024-01-02 10:00:00'), "
+                          "(2, 'S2', 1, 50, 'cancelled', 'cash', '2024-01-02 11:00:00')"))
+        conn.execute(text("INSERT INTO sale_items (sale_id, product_id, quantity, unit_price, total_price) VALUES "
+                          "(1, 1, 2, 50, 100), (2, 1, 1, 50, 50)"))
+    migrations.upgrade(engine)
+    with engine.connect() as conn:
+        row = conn.execute(text('SELECT day, payment_method, revenue, transaction_count, item_count FROM daily_sales_summaries')).one()
+    assert tuple(row) == ('2024-01-02', 'cash', 100, 1, 2)
@@ -0,0 +1,18 @@
+# tests/test_pagination.py
+import pytest
+from pagination import decode_cursor, encode_cursor
+from models import Customer, Sale
+
+@pytest.mark.parametrize('values, columns', [
+    ([5, 1], [Sale.sale_date, Sale.id]),
+    (['abc', 1], [Customer.total_spent, Customer.id]),
+    ([None, 1], [Customer.total_spent, Customer.id]),
+])
+def test_bad_cursor_values_raise_value_error(values, columns):
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor(values), columns)
+
+@pytest.mark.parametrize('path', ['/api/sales?cursor={}', '/sales?cursor={}', '/customers?sort=spent&cursor={}'])
+def test_bad_cursor_is_not_a_server_error(client, path):
+    cursor = encode_cursor(['abc', 1]) if 'customers' in path else encode_cursor([5, 1])
+    assert client.get(path.format(cursor)).status_code < 500
@@ -0,0 +1,18 @@
+# tests/test_reporting.py
+from datetime import date
+from reporting import ReportCache
+
+def test_bad_custom_range_redirects_with_flash(client):
+    response = client.get('/reports?period=custom&start_date=bad')
+    assert response.status_code == 302 and response.headers['Location'].endswith('/reports')
+
+def test_report_cache_is_bounded():
+    cache, day = ReportCache(max_size=3), date(2024, 1, 1)
+    for i in range(10): cache.get_or_compute(('r', i), day, day, lambda: {'i': i}, 60)
+    assert len(cache._entries) == 3
+
+def test_report_cache_prunes_expired_entries():
+    cache, day = ReportCache(), date(2024, 1, 1)
+    cache.get_or_compute(('r', 1), day, day, dict, -1)  # hết hạn ngay
+    cache.get_or_compute(('r', 2), day, day, dict, 60)
+    assert list(cache._entries) == [('r', 2)]
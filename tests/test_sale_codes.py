@@ -0,0 +1,22 @@
+# tests/test_sale_codes.py
+from datetime import datetime
+from sale_codes import SaleCodeAllocator
+
+def test_two_allocators_never_share_a_code(app):
+    a, b, now = SaleCodeAllocator(block_size=3), SaleCodeAllocator(block_size=3), datetime(2099, 1, 1, 12)
+    codes = {alloc: [] for alloc in (a, b)}
+    for _ in range(10):
+        for alloc in (a, b): codes[alloc].append(alloc.next_code(now))
+    assert len(set(codes[a]) | set(codes[b])) == 20
+    assert all(c == sorted(c) for c in codes.values())  # mỗi worker cấp tăng dần trong khối của mình
+
+def test_counter_restarts_on_new_utc_day(app):
+    alloc = SaleCodeAllocator(block_size=5)
+    assert alloc.next_code(datetime(2099, 2, 1, 23, 59)) == 'SALE-20990201-000001'
+    assert alloc.next_code(datetime(2099, 2, 1, 23, 59)) == 'SALE-20990201-000002'
+    assert alloc.next_code(datetime(2099, 2, 2, 0, 0)) == 'SALE-20990202-000001'
+
+def test_default_day_is_utc(app, monkeypatch):
+    import today_stats
+    monkeypatch.setattr(today_stats, 'today', lambda: datetime(2099, 3, 1).date())
+    assert SaleCodeAllocator().next_code().startswith('SALE-20990301-')
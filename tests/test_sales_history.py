@@ -0,0 +1,18 @@
+# tests/test_sales_history.py
+import re
+from checkout import checkout
+from database import db
+
+def test_history_is_keyset_paginated(client, admin, product):
+    product.stock_quantity = 10; db.session.commit()
+    codes = [checkout(admin, [{'product_id': product.id, 'quantity': 1}]).sale_code for _ in range(3)]
+    client.get('/sales/history')  # tiêu thụ flash đăng nhập
+    first = client.get('/sales/history?period=today&limit=2').get_data(as_text=True)
+    assert codes[2] in first and codes[1] in first and codes[0] not in first
+    cursor = re.search(r'cursor=([^&"]+)', first).group(1)
+    second = client.get(f'/sales/history?period=today&limit=2&cursor={cursor}').get_data(as_text=True)
+    assert codes[0] in second and codes[2] not in second
+
+def test_history_bad_cursor_redirects(client):
+    response = client.get('/sales/history?period=today&cursor=bad')
+    assert response.status_code == 302 and 'cursor' not in response.headers['Location']
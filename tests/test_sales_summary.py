@@ -0,0 +1,23 @@
+# tests/test_sales_summary.py
+import sales_summary
+from checkout import checkout
+from database import db
+from models import Sale
+from routes import sales_stats
+
+def test_rollup_matches_sales_table(admin, product):
+    checkout(admin, [{'product_id': product.id, 'quantity': 2}])
+    assert sales_stats() == sales_stats(Sale.query)
+
+def test_rebuild_keeps_item_count(admin, product):
+    checkout(admin, [{'product_id': product.id, 'quantity': 2}])
+    before = sales_summary.totals()
+    sales_summary.rebuild(); db.session.commit()
+    assert sales_summary.totals() == before and before[2] >= 2
+
+def test_cancelled_sale_cannot_be_completed(client, admin, product):
+    sale = checkout(admin, [{'product_id': product.id, 'quantity': 1}])
+    assert client.post(f'/api/sale/{sale.id}/cancel').status_code == 200
+    before = sales_summary.totals()
+    response = client.post(f'/api/sale/{sale.id}/complete')
+    assert response.status_code == 400 and sales_summary.totals() == before
@@ -0,0 +1,39 @@
+# tests/test_search.py
+import os
+from sqlalchemy import create_engine, text
+from sqlalchemy.dialects import postgresql
+import migrations, search
+from database import db
+from models import Product
+
+def _product(name):
+    p = Product(name=name, sku=f'TEST-{os.urandom(4).hex()}', price=1000, stock_quantity=5)
+    db.session.add(p); db.session.commit()
+    return p
+
+def test_fts_is_accent_insensitive(app):
+    p = _product('Cà Phê Sữa Đá')
+    for term in ('ca phe', 'CÀ PHÊ', 'sua da', 'phe su'):
+        assert p in Product.query.filter(search.matches('product', term)).all(), term
+
+def test_migration_backfills_existing_rows(app, tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path / "old.db"}')
+    migrations.upgrade(engine, target=1)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO products (name, sku, price) VALUES ('Điện thoại', 'DT-1', 100)"))
+    migrations.upgrade(engine)
+    with engine.connect() as conn:
+        hits = conn.execute(text("SELECT ref_id FROM search_index WHERE kind = 'product' AND search_index MATCH :q"),
+                            {'q': search._fts_query('dien thoai')}).all()
+    assert len(hits) == 1
+
+def test_postgres_uses_unaccent_trigram_pattern(app):
+    criterion = search.matches('product', 'Cà phê 50%', dialect='postgresql')
+    compiled = criterion.compile(dialect=postgresql.dialect())
+    assert 'f_unaccent(lower(products.name)) LIKE' in str(compiled)
+    assert '%ca phe 50\\%%' in compiled.params.values()
+
+def test_other_databases_fall_back_to_ilike(app):
+    criterion = search.matches('customer', 'Nguyễn', dialect='mysql')
+    assert 'lower(customers.name) LIKE lower' in str(criterion)
+    assert search.matches('product', '   ') is None
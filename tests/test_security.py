@@ -0,0 +1,16 @@
+# tests/test_security.py
+import security
+
+def _login(client, password, ip='10.0.0.1'):
+    return client.post('/login', data={'username': 'admin', 'password': password}, environ_base={'REMOTE_ADDR': ip})
+
+def test_successful_logins_do_not_lock_shared_ip(app):
+    security.limiter._hits.clear()
+    for _ in range(app.config['LOGIN_RATE_LIMIT_IP'] + 5):
+        assert _login(app.test_client(), 'admin123').status_code == 302
+
+def test_failed_logins_are_limited(app):
+    security.limiter._hits.clear()
+    codes = [_login(app.test_client(), 'wrong', ip='10.0.0.2').status_code for _ in range(app.config['LOGIN_RATE_LIMIT_USER'] + 1)]
+    assert codes[-1] == 429
+    security.limiter._hits.clear()
@@ -0,0 +1,51 @@
+# tests/test_today_stats.py
+from datetime import date
+import pytest
+import today_stats
+from checkout import checkout
+
+def _cached():
+    return today_stats.get_today()
+
+def _fresh():
+    today_stats.stats.clear()
+    return _cached()
+
+@pytest.fixture(autouse=True)
+def long_ttl(app):
+    # Tổng chạy chỉ đúng nếu mọi đường ghi đều cộng delta: TTL dài để không đọc lại DB giữa chừng
+    app.config['TODAY_STATS_TTL'] = 3600
+    today_stats.stats.clear()
+    yield
+    app.config.pop('TODAY_STATS_TTL')
+
+def test_low_stock_change():
+    assert today_stats.low_stock_change([(20, 5, 10)]) == 1
+    assert today_stats.low_stock_change([(5, 20, 10)]) == -1
+    assert today_stats.low_stock_change([(5, 5, 10, 2)]) == -1  # đổi min_stock
+    assert today_stats.low_stock_change([(None, 1, None, 10)]) == 1  # sản phẩm mới
+    assert today_stats.low_stock_change([(1, None, 10, None)]) == -1  # sản phẩm bị xoá
+
+def test_checkout_updates_running_totals(admin, product):
+    before = _cached()
+    checkout(admin, [{'product_id': product.id, 'quantity': 1}])
+    after = _cached()
+    assert after['transactions'] == before['transactions'] + 1 and after['revenue'] == before['revenue'] + 10000
+    assert after == _fresh()
+
+def test_product_form_and_delete_update_low_stock(client, product):
+    _cached()
+    form = {'name': product.name, 'sku': product.sku, 'price': '10000', 'stock_quantity': '50', 'min_stock': '1'}
+    client.post(f'/product/edit/{product.id}', data=form)
+    assert _cached() == _fresh()
+    client.post(f'/product/edit/{product.id}', data=dict(form, min_stock='100'))
+    assert _cached() == _fresh()
+    client.post('/product/add', data=dict(form, sku=product.sku + '-B', stock_quantity='0'))
+    assert _cached() == _fresh()
+    client.get(f'/product/delete/{product.id}')
+    assert _cached() == _fresh()
+
+def test_other_days_do_not_touch_today(app):
+    before = _cached()
+    today_stats.record(day=date(2000, 1, 1), revenue=500, transactions=1)
+    assert _cached() == before
@@ -0,0 +1,73 @@
+# today_stats.py
+# Số liệu "hôm nay" trên dashboard: doanh thu, số giao dịch, số sản phẩm sắp hết hàng.
+# Giữ tổng chạy trong bộ nhớ, cộng delta khi có đơn hàng / điều chỉnh kho và đẩy delta qua Socket.IO (today_delta).
+# Mỗi TODAY_STATS_TTL giây đọc lại từ DB để khớp với thay đổi của các worker khác.
+import hashlib, threading, time
+from datetime import datetime
+from flask import current_app
+from models import Product
+import events, sales_summary
+
+def today():
+    # Cùng quy ước ngày với bảng tổng hợp (sale_date lưu theo UTC)
+    return datetime.utcnow().date()
+
+def _is_low(quantity, min_stock):
+    return quantity is not None and min_stock is not None and quantity <= min_stock
+
+def low_stock_change(changes):
+    """[(tồn cũ, tồn mới, min_stock[, min_stock mới])] -> số sản phẩm sắp hết hàng tăng/giảm bao nhiêu."""
+    return sum(_is_low(c[1], c[-1]) - _is_low(c[0], c[2]) for c in changes)
+
+class TodayStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._day, self._values, self._loaded_at = None, None, 0.0
+
+    def _load(self):
+        day = today()
+        revenue, count = sales_summary.daily_totals(day, day).get(day, (0, 0))
+        low_stock = Product.query.filter(Product.stock_quantity <= Product.min_stock).count()
+        return day, {'revenue': revenue, 'transactions': count, 'low_stock': low_stock}
+
+    def snapshot(self, ttl):
+        """(day, {'revenue', 'transactions', 'low_stock'}); chỉ truy vấn DB khi hết hạn hoặc sang ngày mới."""
+        with self._lock:
+            if self._values is not None and self._day == today() and time.monotonic() - self._loaded_at < ttl:
+                return self._day, dict(self._values)
+        day, values = self._load()
+        with self._lock:
+            self._day, self._values, self._loaded_at = day, values, time.monotonic()
+        return day, dict(values)
+
+    def apply(self, day=None, revenue=0, transactions=0, low_stock=0):
+        """Cộng delta vào tổng chạy; trả về delta thực sự áp dụng cho hôm nay (rỗng nếu không có gì)."""
+        delta = {}
+        if day == today() and (revenue or transactions):
+            delta.update(revenue=float(revenue), transactions=transactions)
+        if low_stock: delta['low_stock'] = low_stock
+        with self._lock:
+            if delta and self._values is not None and self._day == today():
+                for key, value in delta.items(): self._values[key] += value
+        return delta
+
+    def clear(self):
+        with self._lock: self._day, self._values = None, None
+
+stats = TodayStats()
+
+def get_today():
+    day, values = stats.snapshot(current_app.config.get('TODAY_STATS_TTL', 60))
+    return dict(values, day=day.isoformat())
+
+def etag(data):
+    return hashlib.sha1(repr(sorted(data.items())).encode()).hexdigest()
+
+def record(day=None, revenue=0, transactions=0, low_stock=0):
+    """Gọi sau commit: cập nhật tổng chạy và đẩy delta tới các dashboard đang mở."""
+    delta = stats.apply(day, revenue, transactions, low_stock)
+    if delta: events.publish_today(dict(delta, day=today().isoformat()))
+
+def record_sale(sale, sign=1, low_stock=0):
+    """Đơn hàng hoàn thành (sign=1) hoặc bị huỷ sau khi đã hoàn thành (sign=-1)."""
+    record((sale.sale_date or datetime.utcnow()).date(), sign * (sale.total_amount or 0), sign, low_stock)
@@ -0,0 +1,70 @@
+# user_cache.py
+# Cache LRU + TTL (trong từng worker) cho danh tính người dùng đã đăng nhập: load_user không truy vấn DB ở mỗi request
+# hay mỗi lần bắt tay Socket.IO. Xoá khi bản ghi User đổi trong tiến trình này; các worker khác tự làm mới sau USER_CACHE_TTL.
+import threading, time
+from collections import OrderedDict
+from flask import current_app
+from flask_login import UserMixin
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from database import db
+from models import User
+
+class CachedUser(UserMixin):
+    """Bản sao chỉ đọc của User, không gắn với session nên dùng chung giữa các request được."""
+    __slots__ = ('id', 'username', 'email', 'role', 'active', 'created_at')
+
+    def __init__(self, user):
+        self.id, self.username, self.email, self.role = user.id, user.username, user.email, user.role
+        self.active, self.created_at = user.is_active is not False, user.created_at
+
+    @property
+    def is_active(self):
+        return self.active
+
+class UserCache:
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # user_id -> (expires_at, CachedUser)
+
+    def get(self, user_id, ttl):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                return entry[1]
+        user = db.session.get(User, user_id)
+        if user is None: return None
+        identity = CachedUser(user)
+        with self._lock:
+            self._entries[user_id] = (now + ttl, identity)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size: self._entries.popitem(last=False)
+        return identity
+
+    def invalidate(self, user_id):
+        with self._lock: self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock: self._entries.clear()
+
+cache = UserCache()
+
+def load_user(user_id):
+    try: user_id = int(user_id)
+    except (TypeError, ValueError): return None
+    return cache.get(user_id, current_app.config.get('USER_CACHE_TTL', 60))
+
+def _changed(mapper, connection, target):
+    cache.invalidate(target.id)
+    object_session(target).info.setdefault('changed_users', set()).add(target.id)
+
+def _after_commit(session):
+    # Request khác có thể đã nạp lại bản cũ giữa lúc flush và commit
+    for user_id in session.info.pop('changed_users', ()): cache.invalidate(user_id)
+
+event.listen(User, 'after_update', _changed)
+event.listen(User, 'after_delete', _changed)
+event.listen(Session, 'after_commit', _after_commit)
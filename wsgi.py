@@ -0,0 +1,17 @@
+# wsgi.py
+# Entry point cho gunicorn production: gunicorn -c gunicorn.conf.py wsgi:app
+# Worker eventlet đã monkey-patch thư viện chuẩn trước khi nạp file này; psycopg2 là C extension nên phải
+# bật chế độ chờ I/O hợp tác riêng, nếu không một truy vấn chậm sẽ chặn mọi kết nối khác của worker.
+try:
+    from eventlet.patcher import is_monkey_patched
+except ImportError:
+    is_monkey_patched = lambda module: False
+
+if is_monkey_patched('socket'):
+    try:
+        from eventlet.support import psycopg2_patcher
+        psycopg2_patcher.make_psycopg_green()
+    except ImportError:
+        pass  # không dùng PostgreSQL
+
+from app import app